@@ -0,0 +1,74 @@
+"""Generate synthetic config modules and values for the benchmarks."""
+import os
+import random
+
+
+FIELD_KINDS = [
+    ("str", "fields.StringField({file})"),
+    ("int", "fields.IntegerField({file}, min_value=0, max_value=1000000)"),
+    ("secret", "fields.StringField({file}, hide=True, min_length=8)"),
+    ("bool", "fields.BooleanField({file})"),
+    ("email", "fields.EmailField({file})"),
+    ("strlist", "fields.StringListField({file}, min_items=1)"),
+    ("hostlist", "fields.HostNameListField({file})"),
+    ("iplist", "fields.IPListField({file})"),
+]
+
+
+def write_module(
+    directory, name="gstack_bench_conf", sections=20, fields=50, files=4, blobs=2
+):
+    """Write a config module with `sections` x `fields` fields spread over
+    `files` storage files, plus `blobs` big file fields. Returns the field kinds
+    by name."""
+    lines = ["from gstackutils import conf, fields", ""]
+    for f in range(files):
+        lines.append(f"file{f} = conf.File({os.path.join(directory, f'bench{f}.conf')!r})")
+    kinds = {}
+    for s in range(sections):
+        lines += ["", "", f"class SECTION{s}(conf.Section):", f'    """Section {s}."""']
+        for i in range(fields):
+            kind, template = FIELD_KINDS[(s * fields + i) % len(FIELD_KINDS)]
+            name_ = f"S{s}_{kind.upper()}_{i}"
+            kinds[name_] = kind
+            lines.append(f"    {name_} = {template.format(file=f'file{i % files}')}")
+    lines += ["", "", "class BLOBS(conf.Section):"]
+    for b in range(blobs):
+        kinds[f"BLOB_{b}"] = "blob"
+        lines.append(f"    BLOB_{b} = fields.FileField(file{b % files})")
+    if not blobs:
+        lines.append("    pass")
+    with open(os.path.join(directory, f"{name}.py"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return kinds
+
+
+def value(kind, rnd, list_items=100, blob_size=1024 * 1024):
+    if kind == "str":
+        return "".join(rnd.choices("abcdefghijklmnopqrstuvwxyz", k=20))
+    if kind == "int":
+        return rnd.randint(0, 1000000)
+    if kind == "secret":
+        return "".join(rnd.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=32))
+    if kind == "bool":
+        return rnd.choice([True, False])
+    if kind == "email":
+        return ("Bench", f"user{rnd.randint(0, 999)}@example.com")
+    if kind == "strlist":
+        return [f"item{i}" for i in range(list_items)]
+    if kind == "hostlist":
+        return [f"host{i}.example.com" for i in range(list_items)]
+    if kind == "iplist":
+        return [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(list_items)]
+    if kind == "blob":
+        return rnd.randbytes(blob_size)
+    raise ValueError(kind)
+
+
+def values(kinds, seed=0, list_items=100, blob_size=1024 * 1024):
+    """Return deterministic values for the fields of `write_module`."""
+    rnd = random.Random(seed)
+    return {
+        name: value(kind, rnd, list_items=list_items, blob_size=blob_size)
+        for name, kind in kinds.items()
+    }
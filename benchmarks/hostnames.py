@@ -0,0 +1,102 @@
+"""Which of N host names does a certificate cover?
+
+    python -m benchmarks.hostnames --sans 200 --names 2000
+
+Compares `cert.covered_names`, the per name `cert.valid_for_name` and the
+former implementation: `get_alt_names` and `ssl.match_hostname` for every
+name (only where the ssl module still has it).
+"""
+import argparse
+import random
+import ssl
+import time
+import warnings
+
+
+def reference_valid_for_name(name, cert):
+    """`cert.valid_for_name` as it was, on top of `ssl.match_hostname`."""
+    from gstackutils.cert import get_alt_names
+
+    sanlist = get_alt_names(cert)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            ssl.match_hostname({"subjectAltName": sanlist}, name)
+    except ssl.CertificateError:
+        return False
+    return True
+
+
+def make_cert(dns_names, ips=()):
+    """A self-signed certificate for `dns_names` and `ips`."""
+    from OpenSSL import crypto
+    from gstackutils import cert
+
+    key = crypto.PKey()
+    key.generate_key(crypto.TYPE_RSA, 2048)
+    crt = cert.make_cert("bench")
+    crt.set_issuer(crt.get_subject())
+    crt.set_pubkey(key)
+    altnames = [f"DNS:{n}" for n in dns_names] + [f"IP:{i}" for i in ips]
+    crt.add_extensions([
+        crypto.X509Extension(b"subjectAltName", False, ",".join(altnames).encode())
+    ])
+    crt.sign(key, "sha256")
+    return crt
+
+
+def workload(sans, names, seed=0):
+    """Return (SAN DNS names, SAN IPs, names to check), about a third of them covered."""
+    rnd = random.Random(seed)
+    domains = [f"d{i}.example.com" for i in range(sans)]
+    dns_names = [d if i % 2 else f"*.{d}" for i, d in enumerate(domains)]
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(sans // 10)]
+    checked = []
+    for _ in range(names):
+        domain = rnd.choice(domains)
+        checked.append(rnd.choice([
+            domain, f"www.{domain}", f"a.b.{domain}", f"www.other{rnd.randint(0, 9)}.org",
+            rnd.choice(ips) if ips else domain, f"10.1.0.{rnd.randint(0, 255)}",
+        ]))
+    return dns_names, ips, checked
+
+
+def run(sans=200, names=2000, repeat=3):
+    """Return {path: seconds} of checking every name, best of `repeat`."""
+    from gstackutils import cert
+
+    dns_names, ips, checked = workload(sans, names)
+    crt = make_cert(dns_names, ips)
+    paths = {
+        "bulk": lambda: cert.covered_names(checked, crt),
+        "per_name": lambda: [n for n in checked if cert.valid_for_name(n, crt)],
+    }
+    if hasattr(ssl, "match_hostname"):
+        paths["per_name_reference"] = lambda: [
+            n for n in checked if reference_valid_for_name(n, crt)
+        ]
+    results = {}
+    for path, func in paths.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[path] = best
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sans", type=int, default=200)
+    parser.add_argument("--names", type=int, default=2000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for path, seconds in run(args.sans, args.names, args.repeat).items():
+        print(f"{path:<20} {seconds * 1000:10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Key generation and certificate signing per key type.
+
+    python -m benchmarks.keytypes -r 10
+
+For every key type (and RSA key size) reports the median seconds of
+generating a key, and of signing a leaf certificate with a CA key of that
+type.
+"""
+import argparse
+import statistics
+import time
+
+
+def median_seconds(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run(repeat=5, rsa_sizes=(2048, 4096)):
+    """Return {key type: {"generate": seconds, "sign": seconds}}."""
+    from gstackutils import cert, keys
+
+    kinds = [(f"rsa-{size}", "rsa", size) for size in rsa_sizes]
+    kinds += [(key_type, key_type, None) for key_type in keys.KEY_TYPES if key_type != "rsa"]
+    results = {}
+    for name, key_type, key_size in kinds:
+        cakey = keys.generate(key_type, key_size)
+        cacert = cert.make_ca_cert("bench CA", cakey)
+        leaf = keys.generate(key_type, key_size)
+        results[name] = {
+            "generate": median_seconds(lambda: keys.generate(key_type, key_size), repeat),
+            "sign": median_seconds(
+                lambda: cert.sign_leaf(["bench.local"], ["10.0.0.1"], leaf, cakey, cacert), repeat
+            ),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--rsa-size", type=int, action="append", help="default: 2048 and 4096")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.rsa_size or (2048, 4096))
+    for name, r in results.items():
+        generate, sign = r["generate"] * 1000, r["sign"] * 1000
+        print(f"{name:<10} generate {generate:10.3f} ms   sign {sign:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare config lookups through `gstack conf serve` with spawning the CLI.
+
+    python -m benchmarks.server -n 2000 -s 20
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+MODULE = "gstack_server_bench_conf"
+
+
+def start_server(config, path):
+    """Serve `config` at `path` in a thread, return a function stopping it."""
+    from gstackutils import server
+
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    tasks = []
+
+    async def run():
+        ready = asyncio.Event()
+        tasks.append(asyncio.ensure_future(server.ConfigServer(config).serve(path, started=ready)))
+        await ready.wait()
+        started.set()
+        try:
+            await tasks[0]
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(run(),), daemon=True)
+    thread.start()
+    started.wait(10)
+
+    def stop():
+        loop.call_soon_threadsafe(tasks[0].cancel)
+        thread.join()
+        loop.close()
+
+    return stop
+
+
+def rate(count, func):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return count / (time.perf_counter() - start)
+
+
+def run(requests=2000, spawns=20):
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, f"{MODULE}.py"), "w") as f:
+            f.write(
+                "from gstackutils import conf, fields\n"
+                f"config_file = conf.File({os.path.join(directory, 'bench.conf')!r})\n"
+                "class BENCH(conf.Section):\n"
+                "    VALUE = fields.StringField(config_file)\n"
+            )
+        sys.path.insert(0, directory)
+        try:
+            env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+            from gstackutils import client, conf
+
+            config = conf.Config(MODULE)
+            config.set("VALUE", "hello")
+            sock = os.path.join(directory, "conf.sock")
+            stop = start_server(config, sock)
+            try:
+                with client.Client(sock) as c:
+                    results = {"server": rate(requests, lambda: c.get("VALUE"))}
+                results["client_process"] = rate(spawns, lambda: subprocess.run(
+                    [sys.executable, "-m", "gstackutils.client", "-s", sock, "get", "VALUE"],
+                    env=env, stdout=subprocess.DEVNULL, check=True
+                ))
+            finally:
+                stop()
+            results["cli_process"] = rate(spawns, lambda: subprocess.run(
+                [
+                    sys.executable, "-c", "from gstackutils.cli import cli; cli()",
+                    "conf", "-c", MODULE, "retrieve", "VALUE"
+                ],
+                env=env, stdout=subprocess.DEVNULL, check=True
+            ))
+        finally:
+            sys.path.remove(directory)
+            sys.modules.pop(MODULE, None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("-s", "--spawns", type=int, default=20)
+    args = parser.parse_args()
+
+    results = run(args.requests, args.spawns)
+    print(f"server (one connection):     {results['server']:8.0f} req/s")
+    print(f"client process per request:  {results['client_process']:8.1f} req/s")
+    print(f"gstack conf retrieve:        {results['cli_process']:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
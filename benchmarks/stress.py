@@ -0,0 +1,119 @@
+"""Concurrent `set`/`retrieve` stress test against a single storage file.
+
+Every worker process owns one config and sets it to increasing values, while
+reading every other config after each write. At the end each config should
+hold the last value written by its owner; anything else is a lost write.
+
+    python -m benchmarks.stress -p 8 -n 200
+    python -m benchmarks.stress --single-file-mount
+
+With `--single-file-mount` every worker plays a container mounting only the
+storage file: it sees the file as a mount point and has a lock file of its own.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+
+MODULE = "gstack_stress_conf"
+
+
+def write_config_module(directory, processes, single_file_mount=False):
+    path = os.path.join(directory, "stress.conf")
+    lines = ["import os", "from gstackutils import conf, fields"]
+    if single_file_mount:
+        lines += [
+            "class MountedFile(conf.File):",
+            "    lock_path = property(",
+            "        lambda self: self.path.with_name(f'{self.path.name}.{os.getpid()}.lock')",
+            "    )",
+            "    def mounted(self):",
+            "        return True",
+            f"config_file = MountedFile({path!r})",
+        ]
+    else:
+        lines.append(f"config_file = conf.File({path!r})")
+    lines.append("class STRESS(conf.Section):")
+    lines += [f"    W{i} = fields.IntegerField(config_file)" for i in range(processes)]
+    with open(os.path.join(directory, f"{MODULE}.py"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def worker(directory, index, processes, iterations):
+    sys.path.insert(0, directory)
+    from gstackutils import conf, exceptions
+
+    c = conf.Config(MODULE)
+    errors = 0
+    for i in range(iterations):
+        c.set(f"W{index}", i)
+        for j in range(processes):
+            try:
+                c.retrieve(f"W{j}")
+            except exceptions.ConfigNotSetError:
+                pass  # not written yet
+            except ValueError:
+                errors += 1  # a half-written file would end up here
+    return errors
+
+
+def run(processes=8, iterations=100, single_file_mount=False):
+    with tempfile.TemporaryDirectory() as directory:
+        write_config_module(directory, processes, single_file_mount)
+        ctx = multiprocessing.get_context("spawn")
+        start = time.perf_counter()
+        with ctx.Pool(processes) as pool:
+            errors = pool.starmap(
+                worker,
+                [(directory, i, processes, iterations) for i in range(processes)]
+            )
+        elapsed = time.perf_counter() - start
+
+        sys.path.insert(0, directory)
+        try:
+            from gstackutils import conf
+            c = conf.Config(MODULE)
+            lost = [
+                f"W{i}" for i in range(processes)
+                if c.retrieve(f"W{i}") != iterations - 1
+            ]
+        finally:
+            sys.path.remove(directory)
+            sys.modules.pop(MODULE, None)
+
+    writes = processes * iterations
+    return {
+        "processes": processes,
+        "iterations": iterations,
+        "elapsed": elapsed,
+        "writes_per_sec": writes / elapsed,
+        "reads_per_sec": writes * processes / elapsed,
+        "read_errors": sum(errors),
+        "lost_writes": lost,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-p", "--processes", type=int, default=8)
+    parser.add_argument("-n", "--iterations", type=int, default=100)
+    parser.add_argument("--single-file-mount", action="store_true")
+    args = parser.parse_args()
+
+    result = run(args.processes, args.iterations, args.single_file_mount)
+    print(f"processes:    {result['processes']}")
+    print(f"iterations:   {result['iterations']}")
+    print(f"elapsed:      {result['elapsed']:.2f} s")
+    print(f"writes/s:     {result['writes_per_sec']:.0f}")
+    print(f"reads/s:      {result['reads_per_sec']:.0f}")
+    print(f"read errors:  {result['read_errors']}")
+    print(f"lost writes:  {', '.join(result['lost_writes']) or 'none'}")
+    if result["read_errors"] or result["lost_writes"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
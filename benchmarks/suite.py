@@ -0,0 +1,148 @@
+"""Benchmarks of config parsing, set, info and certificate generation.
+
+    python -m benchmarks.suite -o new.json
+    python -m benchmarks.suite -o new.json --compare old.json
+
+Every benchmark is repeated and the minimum and median seconds are reported;
+`--compare` flags the benchmarks whose median got slower than the threshold.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from . import generate
+
+
+MODULE = "gstack_bench_conf"
+
+
+def measure(func, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def run(sections=20, fields=50, files=4, list_items=100, blobs=2, blob_size=1024 * 1024, repeat=5):
+    from gstackutils import cert, conf, keypool
+    from gstackutils import fields as modfields
+    from gstackutils import termout
+
+    params = {
+        "sections": sections, "fields": fields, "files": files,
+        "list_items": list_items, "blobs": blobs, "blob_size": blob_size, "repeat": repeat,
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        kinds = generate.write_module(directory, MODULE, sections, fields, files, blobs)
+        values = generate.values(kinds, list_items=list_items, blob_size=blob_size)
+        names = list(kinds)
+        sys.path.insert(0, directory)
+        try:
+            conf.Config(MODULE).set_many(values)
+
+            def cold():
+                modfields.Field.decode_cache.clear()
+                return conf.Config(MODULE)
+
+            def warm():
+                c = conf.Config(MODULE)
+                for name in names:
+                    c.retrieve(name, validate=False)
+                return c
+
+            def retrieve_all(c):
+                for name in names:
+                    c.retrieve(name)
+
+            results["config_init"] = measure(lambda _: conf.Config(MODULE), repeat)
+            results["retrieve_one_cold"] = measure(lambda c: c.retrieve(names[0]), repeat, cold)
+            results["retrieve_all_cold"] = measure(retrieve_all, repeat, cold)
+            results["retrieve_all_warm"] = measure(retrieve_all, repeat, warm)
+            results["set_one"] = measure(lambda c: c.set(names[0], values[names[0]]), repeat, cold)
+            many = dict(list(values.items())[:100])
+            results["set_many_100"] = measure(lambda c: c.set_many(many), repeat, cold)
+            results["info"] = measure(lambda c: c.info(), repeat, cold)
+            info = conf.Config(MODULE).info()
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results["print_info"] = measure(lambda _: termout.print_info(info), repeat)
+
+            cwd = os.getcwd()
+            os.chdir(directory)
+            # an empty pool: measure the key generation, and leave the user's pool alone
+            pool = keypool.KeyPool(os.path.join(directory, "keypool"))
+            try:
+                results["cert_generate"] = measure(
+                    lambda _: cert.generate(["bench.local"], ["10.0.0.1"], keypool=pool), repeat
+                )
+            finally:
+                os.chdir(cwd)
+        finally:
+            sys.path.remove(directory)
+            sys.modules.pop(MODULE, None)
+
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform()},
+        "params": params,
+        "results": results,
+    }
+
+
+def compare(old, new, threshold=0.2):
+    """Return (name, old median, new median) of the benchmarks slower than `threshold`."""
+    regressions = []
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before, after = old["results"][name]["median"], result["median"]
+        if after > before * (1 + threshold):
+            regressions.append((name, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--fields", type=int, default=50, help="fields per section")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--list-items", type=int, default=100)
+    parser.add_argument("--blobs", type=int, default=2)
+    parser.add_argument("--blob-size", type=int, default=1024 * 1024)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    result = run(
+        args.sections, args.fields, args.files, args.list_items,
+        args.blobs, args.blob_size, args.repeat,
+    )
+    for name, r in result["results"].items():
+        print(f"{name:<20} min {r['min'] * 1000:10.3f} ms   median {r['median'] * 1000:10.3f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if old["params"] != result["params"]:
+            print("warning: the runs used different parameters", file=sys.stderr)
+        regressions = compare(old, result, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Host name, IP and e-mail validators on pathological inputs.
+
+    python -m benchmarks.validators
+    python -m benchmarks.validators --size 24 --reference
+
+Times the validators of gstackutils on inputs that made the regular
+expressions they used to be built on backtrack. `--reference` times those
+expressions (kept below) as well; mind that the e-mail expression is
+exponential in `--size`.
+"""
+import argparse
+import re
+import time
+
+
+# The regular expressions the validators used to match, the reference of the
+# differential tests.
+HOST_RE = (
+    r"^(([a-zA-Z0-9]|[a-zA-Z0-9][a-zA-Z0-9\-]*[a-zA-Z0-9])\.)*"
+    r"([A-Za-z0-9]|[A-Za-z0-9][A-Za-z0-9\-]*[A-Za-z0-9])$"
+)
+IP_RE = (
+    r"^(([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.){3}"
+    r"([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])$"
+)
+IP_RANGE_RE = IP_RE[:-1] + r"/(.+)$"
+
+WSP = r'[\s]'
+CRLF = r'(?:\r\n)'
+NO_WS_CTL = r'\x01-\x08\x0b\x0c\x0f-\x1f\x7f'
+QUOTED_PAIR = r'(?:\\.)'
+FWS = r'(?:(?:' + WSP + r'*' + CRLF + r')?' + WSP + r'+)'
+CTEXT = r'[' + NO_WS_CTL + r'\x21-\x27\x2a-\x5b\x5d-\x7e]'
+CCONTENT = r'(?:' + CTEXT + r'|' + QUOTED_PAIR + r')'
+COMMENT = r'\((?:' + FWS + r'?' + CCONTENT + r')*' + FWS + r'?\)'
+CFWS = r'(?:' + FWS + r'?' + COMMENT + ')*(?:' + FWS + '?' + COMMENT + '|' + FWS + ')'
+ATEXT = r'[\w!#$%&\'\*\+\-/=\?\^`\{\|\}~]'
+DOT_ATOM_TEXT = ATEXT + r'+(?:\.' + ATEXT + r'+)*'
+DOT_ATOM = CFWS + r'?' + DOT_ATOM_TEXT + CFWS + r'?'
+QTEXT = r'[' + NO_WS_CTL + r'\x21\x23-\x5b\x5d-\x7e]'
+QCONTENT = r'(?:' + QTEXT + r'|' + QUOTED_PAIR + r')'
+QUOTED_STRING = (
+    CFWS + r'?' + r'"(?:' + FWS + r'?' + QCONTENT + r')*' +
+    FWS + r'?' + r'"' + CFWS + r'?'
+)
+LOCAL_PART = r'(?:' + DOT_ATOM + r'|' + QUOTED_STRING + r')'
+DTEXT = r'[' + NO_WS_CTL + r'\x21-\x5a\x5e-\x7e]'
+DCONTENT = r'(?:' + DTEXT + r'|' + QUOTED_PAIR + r')'
+DOMAIN_LITERAL = (
+    CFWS + r'?' + r'\[' + r'(?:' + FWS + r'?' + DCONTENT + r')*' +
+    FWS + r'?\]' + CFWS + r'?'
+)
+DOMAIN = r'(?:' + DOT_ATOM + r'|' + DOMAIN_LITERAL + r')'
+EMAIL_RE = '^' + LOCAL_PART + r'@' + DOMAIN + '$'
+
+
+def reference_host_name(value):
+    return re.match(HOST_RE, value) is not None
+
+
+def reference_ip(value, range=False):
+    m = re.match(IP_RANGE_RE if range else IP_RE, value)
+    if not m:
+        return False
+    if range:
+        try:
+            r = int(m.group(4))
+        except ValueError:
+            return False
+        return 1 <= r <= 32
+    return True
+
+
+def reference_email(value):
+    return re.match(EMAIL_RE, value) is not None
+
+
+def pathological(size):
+    """Return {name: (kind, input)} of inputs that are slow for the references.
+
+    The e-mail inputs take exponential time in `size`; the host name and IP
+    inputs are just long (1000 * `size` characters), the references backtrack
+    on them only polynomially.
+    """
+    long = 1000 * size
+    return {
+        "host_hyphens": ("host", "a" + "-" * long + "!"),
+        "host_labels": ("host", "a-" * (long // 2) + "."),
+        "ip_digits": ("ip", "1" * long),
+        "email_comment": ("email", "(" + "\x0b" * size),
+        "email_quoted": ("email", '"' + "\x0b" * size + "@"),
+        "email_literal": ("email", "a@[" + "\x0c" * size),
+    }
+
+
+def validators():
+    from gstackutils import validators
+
+    email = validators.EmailValidator()
+    return {
+        "host": (validators.is_host_name, reference_host_name),
+        "ip": (validators.is_ip, reference_ip),
+        "email": (email.is_valid, reference_email),
+    }
+
+
+def measure(func, value, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(value)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(size=20, repeat=3, reference=False):
+    """Return {name: {"seconds": ..., "reference_seconds": ...}}."""
+    funcs = validators()
+    results = {}
+    for name, (kind, value) in pathological(size).items():
+        func, ref = funcs[kind]
+        results[name] = {"seconds": measure(func, value, repeat)}
+        if reference:
+            results[name]["reference_seconds"] = measure(ref, value, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-s", "--size", type=int, default=20)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument(
+        "--reference", action="store_true", help="time the old regular expressions too"
+    )
+    args = parser.parse_args()
+
+    for name, r in run(args.size, args.repeat, args.reference).items():
+        line = f"{name:<16} {r['seconds'] * 1000:10.3f} ms"
+        if "reference_seconds" in r:
+            line += f"   reference {r['reference_seconds'] * 1000:10.3f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
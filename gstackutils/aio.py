@@ -0,0 +1,83 @@
+"""Asyncio support, see `AsyncConfig`."""
+import asyncio
+import functools
+
+from .conf import Config
+
+
+class AsyncConfig:
+    """Asyncio front-end of a `Config`.
+
+    File I/O, decoding and validation run in `executor` (the loop's default
+    one if None). Concurrent reads of the same storage share one read, and
+    concurrent sets are batched: each storage is rewritten once for all the
+    sets made while its previous write was running.
+    """
+
+    def __init__(self, config, executor=None):
+        self.config = config if isinstance(config, Config) else Config(config)
+        self.executor = executor
+        self._reads = {}  # file -> future of the read in progress
+        self._batches = {}  # file -> ({name: raw}, future) waiting to be written
+        self._writing = set()
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def read_file(self, file):
+        future = self._reads.get(file)
+        if future is None:
+            future = asyncio.ensure_future(self.run(self.config.read_file, file))
+            self._reads[file] = future
+            future.add_done_callback(lambda _: self._reads.pop(file, None))
+        return await asyncio.shield(future)
+
+    async def retrieve(self, name, to_stream=False, validate=True):
+        _, field = self.config.get_field(name)
+        if not field.file.indexed:
+            await self.read_file(field.file)
+        return await self.run(self.config.retrieve, name, to_stream=to_stream, validate=validate)
+
+    async def set(self, name, value, from_stream=False, validate=True):
+        await self.set_many({name: value}, from_stream=from_stream, validate=validate)
+
+    async def set_many(self, values, from_stream=False, validate=True):
+        changes = {}
+        for name, value in values.items():
+            field, storagestr = await self.run(
+                self.config.to_storage, name, value, from_stream, validate
+            )
+            changes.setdefault(field.file, {})[name] = storagestr
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for file, file_changes in changes.items():
+            if file not in self._batches:
+                self._batches[file] = ({}, loop.create_future())
+                loop.call_soon(self._flush, file)
+            batch, future = self._batches[file]
+            batch.update(file_changes)
+            futures.append(future)
+        await asyncio.gather(*[asyncio.shield(f) for f in futures])
+
+    def _flush(self, file):
+        if file in self._writing or file not in self._batches:
+            return  # flushed when the running write is done
+        changes, future = self._batches.pop(file)
+        self._writing.add(file)
+        asyncio.ensure_future(self._write(file, changes, future))
+
+    async def _write(self, file, changes, future):
+        try:
+            await self.run(self.config.write_file, file, changes)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(None)
+        finally:
+            self._writing.discard(file)
+            self._flush(file)
+
+    async def info(self, verbosity=0, workers=None):
+        return await self.run(self.config.info, verbosity=verbosity, workers=workers)
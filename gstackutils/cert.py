@@ -1,20 +1,27 @@
 import random
 import datetime
+import ipaddress
+import weakref
 
 from OpenSSL import crypto, SSL
 import cryptography
-import ssl
+from cryptography import x509
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
 
 
 from . import exceptions
+from . import hostindex
+from . import keypool as modkeypool
+from . import keys
 
 
 CERT_NOT_AFTER = 3 * 365 * 24 * 60 * 60
 
 
 def consistent(key, cert):
-    keypub = key.to_cryptography_key().public_key().public_numbers()
-    certpub = cert.get_pubkey().to_cryptography_key().public_numbers()
+    # compare the encoded keys: Ed25519 keys have no public numbers
+    keypub = crypto.dump_publickey(crypto.FILETYPE_ASN1, key)
+    certpub = crypto.dump_publickey(crypto.FILETYPE_ASN1, cert.get_pubkey())
     if keypub != certpub:
         return False
     return True
@@ -33,13 +40,33 @@ def get_alt_names(cert):
     return sanlist
 
 
+# cert -> (extension count, index); extensions can only be added
+_name_indexes = weakref.WeakKeyDictionary()
+
+
+def name_index(cert):
+    """Return the `hostindex.HostIndex` of the subject alternative names of `cert`."""
+    count = cert.get_extension_count()
+    cached = _name_indexes.get(cert)
+    if cached is not None and cached[0] == count:
+        return cached[1]
+    index = hostindex.HostIndex()
+    for kind, value in get_alt_names(cert):
+        if kind == "DNS":
+            index.add_name(value)
+        else:
+            index.add_ip(value)
+    _name_indexes[cert] = (count, index)
+    return index
+
+
 def valid_for_name(name, cert):
-    sanlist = get_alt_names(cert)
-    try:
-        ssl.match_hostname({"subjectAltName": sanlist}, name)
-    except ssl.CertificateError:
-        return False
-    return True
+    return name in name_index(cert)
+
+
+def covered_names(names, cert):
+    """Return the names (in order) `cert` is valid for."""
+    return name_index(cert).covered(names)
 
 
 def expiry(cert):
@@ -57,8 +84,80 @@ def make_cert(certname):
     return cert
 
 
-def generate(names, ips=None, cakeyfile=None, cacertfile=None):
+def new_key(keypool=None, key_type="rsa", key_size=None):
+    """Return a new key from `keypool` (the default pool if None), or a fresh one."""
+    if keypool is None:
+        keypool = modkeypool.KeyPool(key_type=key_type, key_size=key_size)
+    key = keypool.take() if keypool.accepts(key_type, key_size) else None
+    if key is None:
+        key = keys.generate(key_type, key_size)
+    return key
+
+
+def builder(cn, issuer, public_key):
+    """A certificate builder with the fields `make_cert` sets."""
+    now = datetime.datetime.utcnow()
+    return (
+        x509.CertificateBuilder()
+        .serial_number(random.randint(1, 2 ** 64 - 1))
+        .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, cn)]))
+        .issuer_name(issuer)
+        .public_key(public_key)
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(seconds=CERT_NOT_AFTER))
+    )
+
+
+def make_ca_cert(cn, cakey):
+    """Return a self-signed CA certificate for the PKey (or cryptography key) `cakey`."""
+    cakey = keys.to_cryptography(cakey)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, cn)])
+    public_key = cakey.public_key()
+    cacert = (
+        builder(cn, name, public_key)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+        .add_extension(x509.KeyUsage(
+            digital_signature=False, content_commitment=False, key_encipherment=False,
+            data_encipherment=False, key_agreement=False, key_cert_sign=True, crl_sign=True,
+            encipher_only=False, decipher_only=False,
+        ), critical=True)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False)
+        .sign(cakey, keys.signature_hash(cakey))
+    )
+    return crypto.X509.from_cryptography(cacert)
+
+
+def sign_leaf(names, ips, key, cakey, cacert):
+    """Return the certificate of `key` for `names` and `ips`, signed by the CA.
+
+    The keys are PKeys; `cakey` can be a cryptography key too, it is faster
+    to sign many certificates with.
+    """
+    cakey = keys.to_cryptography(cakey)
+    public_key = keys.public_key(key)
+    altnames = [x509.DNSName(n) for n in names]
+    altnames += [x509.IPAddress(ipaddress.ip_address(i)) for i in ips]
+    cert = (
+        builder(names[0], cacert.to_cryptography().subject, public_key)
+        .add_extension(x509.SubjectAlternativeName(altnames), critical=False)
+        .add_extension(x509.ExtendedKeyUsage(
+            [ExtendedKeyUsageOID.SERVER_AUTH, ExtendedKeyUsageOID.CLIENT_AUTH]
+        ), critical=False)
+        # generate names the CA after the leaf, the key identifiers tell them apart
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False)
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key(cakey.public_key()), critical=False
+        )
+        .sign(cakey, keys.signature_hash(cakey))
+    )
+    return crypto.X509.from_cryptography(cert)
+
+
+def generate(
+    names, ips=None, cakeyfile=None, cacertfile=None, keypool=None, key_type="rsa", key_size=None
+):
     ips = ips or []
+    keys.key_size(key_type, key_size)  # fail before writing anything
     if cakeyfile is None and cacertfile:
         raise exceptions.InvalidUsage("cacertfile wihtout cakeyfile")
 
@@ -71,8 +170,7 @@ def generate(names, ips=None, cakeyfile=None, cacertfile=None):
         except Exception as e:
             raise ValueError("invalid CA key")
     else:
-        cakey = crypto.PKey()
-        cakey.generate_key(crypto.TYPE_RSA, 2048)
+        cakey = new_key(keypool, key_type, key_size)
         with open(f"{cn}_CA.key", "wb") as f:
             f.write(crypto.dump_privatekey(SSL.FILETYPE_PEM, cakey))
 
@@ -83,41 +181,17 @@ def generate(names, ips=None, cakeyfile=None, cacertfile=None):
         except Exception as e:
             raise ValueError("invalid CA certificate")
     else:
-        cacert = make_cert(f"{cn}")
-        cacert.set_issuer(cacert.get_subject())
-        cacert.set_pubkey(cakey)
-        cacert.add_extensions([
-            crypto.X509Extension(b"basicConstraints", True, b"CA:TRUE, pathlen:0"),
-            crypto.X509Extension(b"keyUsage", True, b"keyCertSign, cRLSign"),
-            crypto.X509Extension(b"subjectKeyIdentifier", False, b"hash", subject=cacert),
-        ])
-        cacert.sign(cakey, "sha256")
+        cacert = make_ca_cert(cn, cakey)
         with open(f"{cn}_CA.crt", "wb") as f:
             f.write(crypto.dump_certificate(SSL.FILETYPE_PEM, cacert))
 
     if not consistent(cakey, cacert):
         raise exceptions.InvalidUsage("the CA private key and the certificate are not consistent")
 
-    key = crypto.PKey()
-    key.generate_key(crypto.TYPE_RSA, 2048)
+    key = new_key(keypool, key_type, key_size)
     with open(f"{cn}.key", "wb") as f:
         f.write(crypto.dump_privatekey(SSL.FILETYPE_PEM, key))
 
-    req = crypto.X509Req()
-    req.get_subject().CN = cn
-    req.set_pubkey(key)
-    req.sign(key, "sha256")
-
-    cert = make_cert(cn)
-    cert.set_issuer(cacert.get_subject())
-    cert.set_pubkey(req.get_pubkey())
-
-    altnames = [f"DNS:{n}" for n in names] + [f"IP:{i}" for i in ips]
-    altnames = ",".join(altnames)
-    cert.add_extensions([
-        crypto.X509Extension(b'subjectAltName', False, altnames.encode()),
-        crypto.X509Extension(b'extendedKeyUsage', False, b"serverAuth,clientAuth"),
-    ])
-    cert.sign(cakey, "sha256")
+    cert = sign_leaf(names, ips, key, cakey, cacert)
     with open(f"{cn}.crt", "wb") as f:
         f.write(crypto.dump_certificate(SSL.FILETYPE_PEM, cert))
@@ -0,0 +1,218 @@
+"""Issue many certificates signed by one CA, as listed in a manifest.
+
+    {
+        "ca": {"key": "ca.key", "cert": "ca.crt", "name": "internal CA"},
+        "certificates": [
+            {"names": ["db.internal"], "ips": ["10.0.0.5"],
+             "key": "db/tls.key", "cert": "db/tls.crt"},
+            {"names": ["web.internal", "www.internal"]}
+        ]
+    }
+
+`key_type` (one of rsa, ec-p256, ec-p384, ed25519) and `key_size` (RSA
+only) can be given for the whole manifest, the CA and each certificate.
+Relative paths are relative to the manifest. If neither CA file exists, a
+new CA (named `name`, by default after the first certificate) is created
+there. The key and certificate paths of an entry default to `<first
+name>.key` and `<first name>.crt`. YAML manifests (.yaml, .yml) need PyYAML.
+
+The CA is read and checked once; the keys are generated and the certificates
+signed in worker processes. Nothing is written until every certificate is
+ready, then each file is replaced atomically.
+"""
+import concurrent.futures
+import ipaddress
+import json
+import os
+import pathlib
+import time
+
+from OpenSSL import crypto
+
+from . import cert
+from . import conf
+from . import exceptions
+from . import keypool as modkeypool
+from . import keys
+
+
+PHASES = ["manifest", "ca", "key", "sign", "write", "total"]
+
+
+def load_manifest(path):
+    path = pathlib.Path(path)
+    with open(path) as f:
+        if path.suffix in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise exceptions.InvalidUsage("YAML manifests need PyYAML, use JSON instead")
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+    return parse_manifest(manifest, path.parent)
+
+
+def parse_manifest(manifest, base):
+    """Check `manifest`, fill in the defaults and resolve the paths against `base`."""
+    def resolve(p):
+        return base / os.path.expanduser(p)
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("certificates"), list):
+        raise exceptions.InvalidUsage("the manifest should have a list of certificates")
+
+    def key_spec(entry, default=("rsa", None)):
+        key_type = entry.get("key_type", default[0])
+        key_size = entry.get("key_size", default[1] if key_type == default[0] else None)
+        keys.key_size(key_type, key_size)  # check them
+        return key_type, key_size
+
+    default_key = key_spec(manifest)
+    entries = []
+    for i, entry in enumerate(manifest["certificates"]):
+        names = entry.get("names") if isinstance(entry, dict) else None
+        if not names or not isinstance(names, list):
+            raise exceptions.InvalidUsage(f"certificate #{i + 1} has no names")
+        ips = [str(ip) for ip in entry.get("ips", [])]
+        for ip in ips:
+            try:
+                ipaddress.ip_address(ip)
+            except ValueError:
+                raise exceptions.InvalidUsage(f"certificate #{i + 1} has an invalid IP: {ip}")
+        entries.append({
+            "names": [str(n) for n in names],
+            "ips": ips,
+            "key": resolve(entry.get("key", f"{names[0]}.key")),
+            "cert": resolve(entry.get("cert", f"{names[0]}.crt")),
+            **dict(zip(("key_type", "key_size"), key_spec(entry, default_key))),
+        })
+    outputs = [p for e in entries for p in (e["key"], e["cert"])]
+    if len(set(outputs)) != len(outputs):
+        raise exceptions.InvalidUsage("the certificates should have different output paths")
+    if not entries:
+        raise exceptions.InvalidUsage("the manifest lists no certificates")
+    ca = manifest.get("ca") or {}
+    return {
+        "ca": {
+            "key": resolve(ca.get("key", "ca.key")),
+            "cert": resolve(ca.get("cert", "ca.crt")),
+            "name": ca.get("name", f"{entries[0]['names'][0]} CA"),
+            **dict(zip(("key_type", "key_size"), key_spec(ca, default_key))),
+        },
+        "certificates": entries,
+    }
+
+
+def load_ca(ca, keypool=None):
+    """Return the PEM of the CA key and certificate, creating them if needed.
+
+    The third item tells whether the CA was created: it is not written here.
+    """
+    key_exists, cert_exists = ca["key"].exists(), ca["cert"].exists()
+    if key_exists != cert_exists:
+        raise exceptions.InvalidUsage("only one of the CA key and certificate exists")
+    if not key_exists:
+        cakey = cert.new_key(keypool, ca["key_type"], ca["key_size"])
+        cacert = cert.make_ca_cert(ca["name"], cakey)
+        key_pem = crypto.dump_privatekey(crypto.FILETYPE_PEM, cakey)
+        cert_pem = crypto.dump_certificate(crypto.FILETYPE_PEM, cacert)
+        return key_pem, cert_pem, True
+    with open(ca["key"], "rb") as f:
+        key_pem = f.read()
+    with open(ca["cert"], "rb") as f:
+        cert_pem = f.read()
+    try:
+        cakey = crypto.load_privatekey(crypto.FILETYPE_PEM, key_pem)
+    except Exception:
+        raise ValueError("invalid CA key")
+    try:
+        cacert = crypto.load_certificate(crypto.FILETYPE_PEM, cert_pem)
+    except Exception:
+        raise ValueError("invalid CA certificate")
+    if not cert.consistent(cakey, cacert):
+        raise exceptions.InvalidUsage("the CA private key and the certificate are not consistent")
+    return key_pem, cert_pem, False
+
+
+def write(path, data, mode):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conf.atomic_write(path, data, mode=mode)
+
+
+# the CA key, certificate and the key pool of a worker process
+_worker = None
+
+
+def _init_worker(key_pem, cert_pem, keypool_root):
+    global _worker
+    _worker = (
+        keys.to_cryptography(crypto.load_privatekey(crypto.FILETYPE_PEM, key_pem)),
+        crypto.load_certificate(crypto.FILETYPE_PEM, cert_pem),
+        keypool_root,
+    )
+
+
+def _issue(entry):
+    cakey, cacert, keypool_root = _worker
+    started = time.perf_counter()
+    keypool = modkeypool.KeyPool(keypool_root, entry["key_type"], entry["key_size"])
+    key = cert.new_key(keypool, entry["key_type"], entry["key_size"])
+    generated = time.perf_counter()
+    crt = cert.sign_leaf(entry["names"], entry["ips"], key, cakey, cacert)
+    signed = time.perf_counter()
+    return (
+        crypto.dump_privatekey(crypto.FILETYPE_PEM, key),
+        crypto.dump_certificate(crypto.FILETYPE_PEM, crt),
+        {"key": generated - started, "sign": signed - generated},
+    )
+
+
+def issue(manifest_path, workers=None, keypool=None):
+    """Issue the certificates of the manifest at `manifest_path`.
+
+    Return {phase: {"count": ..., "seconds": ...}}; "key" and "sign" are
+    summed over the workers, the others are wall clock times.
+    """
+    if keypool is None:
+        keypool = modkeypool.KeyPool()
+    phases = {phase: {"count": 0, "seconds": 0.0} for phase in PHASES}
+
+    def record(phase, seconds, count=1):
+        phases[phase]["count"] += count
+        phases[phase]["seconds"] += seconds
+
+    started = time.perf_counter()
+    manifest = load_manifest(manifest_path)
+    entries = manifest["certificates"]
+    record("manifest", time.perf_counter() - started)
+
+    start = time.perf_counter()
+    *ca_pem, ca_created = load_ca(manifest["ca"], keypool)
+    record("ca", time.perf_counter() - start)
+
+    initargs = (*ca_pem, keypool.root)
+    if workers == 1:
+        _init_worker(*initargs)
+        results = list(map(_issue, entries))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=initargs
+        ) as executor:
+            results = list(executor.map(_issue, entries))
+
+    if ca_created:
+        # "write" counts the certificates issued
+        start = time.perf_counter()
+        write(manifest["ca"]["key"], ca_pem[0], 0o600)
+        write(manifest["ca"]["cert"], ca_pem[1], 0o644)
+        record("write", time.perf_counter() - start, count=0)
+    for entry, (key_pem, cert_pem, timings) in zip(entries, results):
+        for phase, seconds in timings.items():
+            record(phase, seconds)
+        start = time.perf_counter()
+        write(entry["key"], key_pem, 0o600)
+        write(entry["cert"], cert_pem, 0o644)
+        record("write", time.perf_counter() - start)
+
+    record("total", time.perf_counter() - started)
+    return phases
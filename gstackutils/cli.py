@@ -1,36 +1,81 @@
-import click
-import random as modrandom
-import sys
-import string
+# started before the other imports, so `--profile` can report their time
+import time
+_import_started = time.perf_counter()
 
-from . import conf as modconf
-from . import cert as modcert
-from . import exceptions
-from . import termout
+import click  # noqa: E402
+import os  # noqa: E402
+import pathlib  # noqa: E402
+import random as modrandom  # noqa: E402
+import sys  # noqa: E402
+import string  # noqa: E402
+
+# cert (OpenSSL), termout (rich) and server (asyncio) are slow to import,
+# the commands needing them import them themselves
+from . import conf as modconf  # noqa: E402
+from . import client  # noqa: E402
+from . import exceptions  # noqa: E402
+from . import instrument  # noqa: E402
+from . import keys  # noqa: E402
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
 
 
 @click.group()
-def cli():
-    pass
+@click.option("--profile", is_flag=True, help="Print the time spent in each phase to stderr.")
+@click.option("--profile-json", type=click.File("w"), help="Write the phase counters as JSON.")
+@click.option("--profile-dump", type=click.Path(dir_okay=False), help="Write cProfile stats.")
+@click.pass_context
+def cli(ctx, profile, profile_json, profile_dump):
+    if not (profile or profile_json or profile_dump):
+        return
+    instrument.enable()
+    instrument.record("import", IMPORT_SECONDS)
+    started = time.perf_counter()
+    profiler = None
+    if profile_dump:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def finish():
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_dump)
+        instrument.record("total", time.perf_counter() - started)
+        if profile:
+            print(instrument.report(), file=sys.stderr)
+        if profile_json:
+            profile_json.write(instrument.to_json())
+
+    ctx.call_on_close(finish)
 
 
 @cli.group()
 @click.option("-c", "--config-module")
+@click.option(
+    "--validation-cache", envvar="GSTACK_VALIDATION_CACHE", type=click.Path(dir_okay=False),
+    help="Remember validation results in this file."
+)
 @click.pass_context
-def conf(ctx, config_module):
+def conf(ctx, config_module, validation_cache):
     ctx.ensure_object(dict)
     try:
-        ctx.obj['config'] = modconf.Config(config_module)
+        c = ctx.obj['config'] = modconf.Config(config_module, validation_cache=validation_cache)
     except ModuleNotFoundError as e:
         raise click.ClickException(e)
+    if c.validation_cache is not None:
+        ctx.call_on_close(c.validation_cache.save)
 
 
 @conf.command()
 @click.pass_context
 @click.option('-v', '--verbosity', count=True)
-def info(ctx, verbosity):
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=1)
+def info(ctx, verbosity, jobs):
+    from . import termout
+
     c = ctx.obj["config"]
-    termout.print_info(c.info(), verbosity)
+    termout.print_info(c.info(workers=jobs), verbosity)
     # from rich import print as pp
     # pp(c.info())
 
@@ -69,11 +114,168 @@ def set(ctx, name, value, random, binary_file, text_file, validate):
             )
             c.set(name, value, from_stream=True, validate=validate)
         if binary_file:
-            c.set(name, binary_file.read(), from_stream=True, validate=validate)
+            c.set_file(name, binary_file, validate=validate)
         if text_file:
             c.set(name, text_file.read(), from_stream=True, validate=validate)
     except exceptions.ValidationError as e:
         raise click.ClickException(e)
+    except ValueError as e:
+        # the value can not be converted, e.g. a bad IP set entry
+        raise click.ClickException(f"Invalid value for {name}: {e}")
+
+@conf.command()
+@click.pass_context
+def compact(ctx):
+    """Rewrite journal storage files without the overwritten lines."""
+
+    c = ctx.obj["config"]
+    for file in c.compact():
+        print(f"compacted {file.path}")
+
+
+@conf.command()
+@click.argument("service", required=False)
+@click.option("-n", "--name")
+@click.option("-d", "--secrets-dir", type=click.Path(file_okay=False))
+@click.option('--validate/--no-validate', default=True)
+@click.pass_context
+def provide(ctx, service, name, secrets_dir, validate):
+    """Write the configs of a service (or of every service) to files."""
+
+    c = ctx.obj["config"]
+    if secrets_dir:
+        c.secrets_dir = pathlib.Path(secrets_dir)
+    try:
+        written = c.provide(service, name=name, validate=validate)
+    except exceptions.ConfigMissingError as e:
+        raise click.ClickException(f"No such config: {e}")
+    except (exceptions.ConfigNotSetError, exceptions.ValidationError, ValueError) as e:
+        raise click.ClickException(e)
+    for path in written:
+        print(f"written {path}")
+
+
+@conf.command("exec")
+@click.argument("service")
+@click.argument("command", nargs=-1, required=True, type=click.UNPROCESSED)
+@click.option('--validate/--no-validate', default=True)
+@click.pass_context
+def exec_(ctx, service, command, validate):
+    """Run a command with the environment of a service.
+
+    Put the command after --, e.g. gstack conf exec django -- gunicorn app
+    """
+
+    c = ctx.obj["config"]
+    try:
+        env = c.use(service, validate=validate)
+    except (
+        exceptions.ConfigNotSetError, exceptions.ImproperlyConfigured,
+        exceptions.ValidationError, ValueError
+    ) as e:
+        raise click.ClickException(e)
+    env = {**os.environ, **env}
+    try:
+        os.execvpe(command[0], command, env)
+    except OSError as e:
+        raise click.ClickException(f"{command[0]}: {e.strerror}")
+
+
+@conf.command("remove-stale")
+@click.option("-n", "--dry-run", is_flag=True)
+@click.pass_context
+def remove_stale(ctx, dry_run):
+    """Remove the configs no longer defined from the storage files."""
+
+    c = ctx.obj["config"]
+    for file, names in c.remove_stale(dry_run=dry_run).items():
+        for name in names:
+            print(f"{'would remove' if dry_run else 'removed'} {name} from {file.path}")
+
+
+@conf.command("watch")
+@click.argument("names", nargs=-1)
+@click.option("-i", "--interval", type=float, default=1.0)
+@click.option("--poll", is_flag=True, help="Poll even if inotify is available.")
+@click.pass_context
+def watch_(ctx, names, interval, poll):
+    """Print the configs as they change."""
+
+    c = ctx.obj["config"]
+
+    def report(name, old, new):
+        _, field = c.get_field(name)
+        old = "NOT SET" if old is None else field.reportable(old)
+        new = "NOT SET" if new is None else field.reportable(new)
+        print(f"{name}: {old} -> {new}", flush=True)
+
+    try:
+        c.watch(report, names=names or None, interval=interval, poll=poll)
+    except exceptions.ConfigMissingError as e:
+        raise click.ClickException(f"No such config: {e}")
+    except KeyboardInterrupt:
+        pass
+
+
+@conf.command("compile")
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("-m", "--mode", default="400", help="Octal file mode of the snapshot.")
+@click.option('--validate/--no-validate', default=True)
+@click.pass_context
+def compile_(ctx, output, mode, validate):
+    """Write a snapshot of every config, to be read with gstackutils.snapshot."""
+
+    c = ctx.obj["config"]
+    try:
+        c.compile(output, validate=validate, mode=int(mode, 8))
+    except exceptions.ValidationError as e:
+        raise click.ClickException(e)
+
+
+@conf.command()
+@click.option("-s", "--socket", "path", default=client.DEFAULT_SOCKET, show_default=True)
+@click.option("-m", "--mode", default="600", help="Octal file mode of the socket.")
+@click.pass_context
+def serve(ctx, path, mode):
+    """Serve the configs on a Unix socket, see gstackutils.client."""
+    from . import server
+
+    c = ctx.obj["config"]
+    try:
+        server.serve(c, path, mode=int(mode, 8))
+    except KeyboardInterrupt:
+        pass
+
+
+def get_storage(c, path):
+    for file in c.files:
+        if file.path.resolve() == pathlib.Path(path).resolve():
+            return file
+    raise click.ClickException(f"No such storage: {path}")
+
+
+@conf.command("import")
+@click.argument("storage")
+@click.argument("dotenv", type=click.File("r"))
+@click.pass_context
+def import_(ctx, storage, dotenv):
+    """Copy every NAME=value line of a dotenv file into a storage."""
+
+    c = ctx.obj["config"]
+    file = get_storage(c, storage)
+    file.import_dotenv(dotenv)
+    c.invalidate(file)
+
+
+@conf.command()
+@click.argument("storage")
+@click.pass_context
+def export(ctx, storage):
+    """Print the contents of a storage as NAME=value lines."""
+
+    c = ctx.obj["config"]
+    get_storage(c, storage).export_dotenv(sys.stdout)
+
 
 @conf.command()
 @click.argument("name")
@@ -83,7 +285,7 @@ def retrieve(ctx, name):
 
     c = ctx.obj["config"]
     try:
-        stream = c.retrieve(name, to_stream=True, validate=False)
+        c.retrieve_file(name, sys.stdout.buffer, validate=False)
     except exceptions.DefaultException as e:
         raise click.ClickException("Config value not found")
     except exceptions.ConfigNotSetError as e:
@@ -92,21 +294,88 @@ def retrieve(ctx, name):
         raise click.ClickException(f"No such config: {e}")
     except ValueError as e:
         raise click.ClickException(e)
-    if isinstance(stream, str):
-        print(stream, end="")
-    else:
-        sys.stdout.buffer.write(stream)
 
 
-@cli.command()
-@click.option("-n", "--name", multiple=True, required=True)
+@cli.group(invoke_without_command=True)
+@click.option("-n", "--name", multiple=True)
 @click.option("-i", "--ip", multiple=True)
 @click.option("--cakey", type=click.File(mode="rb"))
 @click.option("--cacert", type=click.File(mode="rb"))
-def cert(name, ip, cakey, cacert):
+@click.option(
+    "-t", "--key-type", type=click.Choice(keys.KEY_TYPES), default="rsa", show_default=True
+)
+@click.option("-s", "--key-size", type=int, help=f"RSA only, default: {keys.RSA_KEY_SIZE}.")
+@click.pass_context
+def cert(ctx, name, ip, cakey, cacert, key_type, key_size):
+    if ctx.invoked_subcommand is not None:
+        return
+    if not name:
+        raise click.UsageError("Missing option '-n' / '--name'.", ctx=ctx)
+    from . import cert as modcert
+
     try:
-        modcert.generate(name, ip, cakey, cacert)
+        modcert.generate(name, ip, cakey, cacert, key_type=key_type, key_size=key_size)
     except exceptions.InvalidUsage as e:
         raise click.UsageError(e)
     except ValueError as e:
         raise click.ClickException(e)
+
+
+@cert.command()
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option("-j", "--jobs", type=click.IntRange(min=1), help="Default: the number of CPUs.")
+def batch(manifest, jobs):
+    """Issue the certificates listed in MANIFEST (JSON or YAML)."""
+    from . import certbatch
+
+    try:
+        phases = certbatch.issue(manifest, jobs)
+    except exceptions.InvalidUsage as e:
+        raise click.UsageError(e)
+    except (ValueError, OSError) as e:
+        raise click.ClickException(e)
+    click.echo(f"{phases['write']['count']} certificates issued")
+    click.echo(f"{'phase':<10} {'count':>6} {'total ms':>10}")
+    for phase, p in phases.items():
+        click.echo(f"{phase:<10} {p['count']:>6} {p['seconds'] * 1000:>10.1f}")
+
+
+@cert.group()
+@click.option(
+    "-d", "--directory", type=click.Path(file_okay=False),
+    help="Default: $GSTACK_KEYPOOL or ~/.cache/gstack/keypool.",
+)
+@click.option(
+    "-t", "--key-type", type=click.Choice(keys.KEY_TYPES), default="rsa", show_default=True
+)
+@click.option("-s", "--key-size", type=int, help=f"RSA only, default: {keys.RSA_KEY_SIZE}.")
+@click.pass_context
+def keypool(ctx, directory, key_type, key_size):
+    """Keys generated ahead of time, used by `gstack cert`."""
+    from . import keypool as modkeypool
+
+    try:
+        ctx.obj = modkeypool.KeyPool(directory, key_type, key_size)
+    except exceptions.InvalidUsage as e:
+        raise click.UsageError(e)
+
+
+@keypool.command()
+@click.argument("n", type=click.IntRange(min=0))
+@click.option("-j", "--jobs", type=click.IntRange(min=1), help="Default: the number of CPUs.")
+@click.pass_obj
+def fill(pool, n, jobs):
+    """Generate keys until the pool has N."""
+    try:
+        generated = pool.fill(n, jobs)
+    except exceptions.InvalidUsage as e:
+        raise click.ClickException(e)
+    click.echo(f"{generated} keys generated, {len(pool)} in {pool.path}")
+
+
+@keypool.command()
+@click.pass_obj
+def status(pool):
+    if pool.path.exists() and not pool.protected():
+        raise click.ClickException(f"{pool.path} is accessible by others, not used")
+    click.echo(f"{len(pool)} keys in {pool.path}")
@@ -0,0 +1,85 @@
+"""A minimal client of `gstackutils.server`.
+
+It only imports the standard library, so it starts fast:
+
+    python -m gstackutils.client -s /run/gstack-conf.sock get NAME
+"""
+import base64
+import json
+import os
+import socket
+import sys
+
+
+DEFAULT_SOCKET = os.environ.get("GSTACK_CONF_SOCKET", "/run/gstack-conf.sock")
+
+
+class ServerError(Exception):
+    pass
+
+
+def decode(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value["base64"])
+    return value
+
+
+class Client:
+    def __init__(self, path=DEFAULT_SOCKET):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.file = self.sock.makefile("rb")
+
+    def request(self, **request):
+        self.sock.sendall(json.dumps(request).encode() + b"\n")
+        response = json.loads(self.file.readline())
+        if not response["ok"]:
+            raise ServerError(response["error"])
+        return response
+
+    def get(self, name):
+        return decode(self.request(op="get", name=name)["value"])
+
+    def get_many(self, names):
+        values = self.request(op="get_many", names=list(names))["values"]
+        return {name: decode(value) for name, value in values.items()}
+
+    def info(self):
+        return self.request(op="info")["info"]
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query a gstack config server.")
+    parser.add_argument("-s", "--socket", default=DEFAULT_SOCKET)
+    sub = parser.add_subparsers(dest="op", required=True)
+    sub.add_parser("get").add_argument("name")
+    sub.add_parser("info")
+    args = parser.parse_args(argv)
+
+    try:
+        with Client(args.socket) as client:
+            if args.op == "get":
+                value = client.get(args.name)
+                if isinstance(value, str):
+                    value = value.encode()
+                sys.stdout.buffer.write(value)
+            else:
+                print(json.dumps(client.info(), indent=2))
+    except (OSError, ServerError) as e:
+        sys.exit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,35 @@
+import contextlib
+import errno
+import fcntl
+import grp
+import hashlib
 import importlib
+import os
 import pathlib
 import inspect
+import io
+import mmap
+import pwd
 import re
+import shutil
+import stat
+import tempfile
+import threading
+import time
 
 from . import exceptions
 from . import fields
+from . import instrument
+from . import snapshot
+from . import validation
+from . import watch
+
+
+# storage strings of blob fields: the prefix followed by the blob's sha256
+BLOB_PREFIX = "@sha256:"
+BLOB_DIGEST = re.compile(r"[0-9a-f]{64}")
+BLOB_CHUNK_SIZE = 1024 * 1024
+BLOB_GRACE_PERIOD = 60 * 60
 
 
 def format_docstring(s):
@@ -13,10 +38,492 @@ def format_docstring(s):
     return "\n".join(info).strip()
 
 
-class File:
+def map_file(f):
+    """Return the content of the open binary file `f` as a read-only mmap."""
+    if os.fstat(f.fileno()).st_size == 0:
+        return b""  # empty files can not be mapped
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def atomic_write(path, data, mode=None, uid=None, gid=None, fsync=False):
+    """Replace the file at `path` with `data` (bytes) in a single rename.
+
+    The data is written to a temporary file in the same directory, which gets
+    its mode and owner before it is renamed over `path`, so readers never see
+    a partially written or wrongly protected file.
+    """
+    path = pathlib.Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+            if mode is not None:
+                os.fchmod(f.fileno(), mode)
+            if uid is not None or gid is not None:
+                os.fchown(f.fileno(), -1 if uid is None else uid, -1 if gid is None else gid)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    if fsync:
+        dirfd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dirfd)
+        finally:
+            os.close(dirfd)
+
+
+class Storage:
+    """Base class of the storage backends fields can be stored in.
+
+    A backend maps config names to raw storage strings (the result of
+    `Field.to_storage`). `Config` caches the index returned by `read` for as
+    long as `version` returns the same key. Backends with `indexed = True`
+    are queried by name through `get` instead.
+    """
+
+    indexed = False
+
     def __init__(self, path):
         self.path = pathlib.Path(path)
 
+    def watch_paths(self):
+        """The paths to watch to detect changes of the storage."""
+        return [self.path]
+
+    @property
+    def blob_dir(self):
+        """The directory of the side-car files of blob fields."""
+        return self.path.with_name(f"{self.path.name}.blobs")
+
+    def ensure(self):
+        """Create the storage if it does not exist yet."""
+        raise NotImplementedError()
+
+    def version(self):
+        """Return a key that changes whenever the content does, None if missing."""
+        raise NotImplementedError()
+
+    def read(self):
+        """Return the version and the whole name -> raw storage string index."""
+        raise NotImplementedError()
+
+    def get(self, name):
+        """Return the raw storage string of `name`, None if it is not set."""
+        return self.read()[1].get(name)
+
+    def write(self, changes):
+        """Atomically apply `changes` (name -> storage string or None to delete)."""
+        raise NotImplementedError()
+
+    def compact(self):
+        """Remove garbage from the storage, return True if anything changed."""
+        return False
+
+    def prune(self, keep, dry_run=False):
+        """Remove every config not in `keep`, return the removed names."""
+        _, index = self.read()
+        stale = [name for name in index if name not in keep]
+        if stale and not dry_run:
+            self.write(dict.fromkeys(stale))
+        return stale
+
+    def import_dotenv(self, f):
+        """Store every `NAME=value` line of the open text file `f`."""
+        self.write(File.parse(f))
+
+    def export_dotenv(self, f):
+        """Write every config to the open text file `f` as `NAME=value` lines."""
+        _, index = self.read()
+        f.writelines([f"{name}={storagestr}\n" for name, storagestr in index.items()])
+
+
+class File(Storage):
+    """A storage file holding one `NAME=value` line per config.
+
+    The file can be shared by containers mounting its directory, or the file
+    alone. A file mounted on its own is rewritten in place instead of being
+    replaced, which only the processes seeing it as a mount point know: mount
+    the directory if the file is also written where it is not mounted.
+    """
+
+    ENV_REGEX = re.compile(r"^\s*([^#].*?)=(.*)$")
+
+    def __init__(self, path, fsync=False):
+        super().__init__(path)
+        self.fsync = fsync
+
+    @property
+    def lock_path(self):
+        return self.path.with_name(f"{self.path.name}.lock")
+
+    @contextlib.contextmanager
+    def lock(self, shared=False):
+        """Hold an advisory lock on the file while in the block.
+
+        The lock is taken on a side-car lock file, as the storage file is
+        usually replaced (not rewritten) on every write, and on the storage
+        file itself: a file mounted on its own is rewritten in place, and
+        every container has its own side-car lock file next to it.
+        """
+        flags = (os.O_RDONLY if shared else os.O_RDWR) | os.O_CREAT
+        fd = os.open(self.lock_path, flags, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            datafd = os.open(self.path, os.O_RDONLY | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(datafd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                yield fd
+            finally:
+                os.close(datafd)
+        finally:
+            os.close(fd)
+
+    def ensure(self):
+        if not self.path.is_file():
+            open(self.path, "a").close()
+
+    @staticmethod
+    def stat_key(st):
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def version(self):
+        try:
+            return self.stat_key(os.stat(self.path))
+        except FileNotFoundError:
+            return None
+
+    def read(self):
+        try:
+            with open(self.path, "r") as f:
+                # files mounted on their own are rewritten, journals appended
+                # in place under the lock; taking it needs no write access
+                fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+                # the file may have been replaced since version() was called
+                return self.stat_key(os.fstat(f.fileno())), self.parse(f)
+        except FileNotFoundError:
+            return None, {}
+
+    @classmethod
+    def parse(cls, lines):
+        index = {}
+        for l in lines:
+            m = cls.ENV_REGEX.match(l)
+            if m:
+                # the first occurrence wins, later duplicates are ignored
+                index.setdefault(m.group(1), m.group(2))
+        return index
+
+    def write(self, changes):
+        """Apply `changes` by rewriting the file.
+
+        The whole read-modify-write cycle runs while holding the file's lock,
+        so concurrent writers (even in other processes) do not lose updates.
+        """
+        with self.lock():
+            self.ensure()
+            with open(self.path, "r") as f:
+                lines = f.readlines()
+            self.replace(self.apply_changes(lines, changes))
+
+    def apply_changes(self, lines, changes):
+        newlines = []
+        done = set()
+        for l in lines:
+            m = self.ENV_REGEX.match(l)
+            if m and m.group(1) in changes:
+                name = m.group(1)
+                # replace the first occurrence, drop the rest and deleted ones
+                if name not in done and changes[name] is not None:
+                    newlines.append(f"{name}={changes[name]}\n")
+                done.add(name)
+            else:
+                newlines.append(l)
+        if newlines and not newlines[-1].endswith("\n"):
+            newlines[-1] += "\n"
+        for name, storagestr in changes.items():
+            if name not in done and storagestr is not None:
+                newlines.append(f"{name}={storagestr}\n")
+        return newlines
+
+    def prune(self, keep, dry_run=False):
+        # a single scan and rewrite under one lock
+        if not self.path.is_file():
+            return []
+        with self.lock() as lockfd:
+            with open(self.path, "r") as f:
+                lines = f.readlines()
+            stale = [name for name in self.parse(lines) if name not in keep]
+            if stale and not dry_run:
+                self.remove_lines(lockfd, lines, stale)
+        return stale
+
+    def remove_lines(self, lockfd, lines, names):
+        self.replace(self.apply_changes(lines, dict.fromkeys(names)))
+
+    def mounted(self):
+        """Whether the file is a mount point (a file bind-mounted on its own)."""
+        try:
+            return os.stat(self.path).st_dev != os.stat(self.path.parent).st_dev
+        except FileNotFoundError:
+            return False
+
+    def replace(self, lines):
+        """Atomically replace the contents of the file with `lines`.
+
+        The original mode is kept, and so is the owner when running as root.
+        A mount point can not be renamed over, it is rewritten in place.
+        """
+        data = "".join(lines).encode()
+        if not self.mounted():
+            st = os.stat(self.path)
+            keep_owner = os.geteuid() == 0
+            try:
+                atomic_write(
+                    self.path, data, mode=stat.S_IMODE(st.st_mode),
+                    uid=st.st_uid if keep_owner else None,
+                    gid=st.st_gid if keep_owner else None,
+                    fsync=self.fsync,
+                )
+                return
+            except OSError as e:
+                if e.errno not in (errno.EBUSY, errno.EXDEV):
+                    raise
+        self.rewrite(data)
+
+    def rewrite(self, data):
+        """Overwrite the file with `data`, keeping the inode (with the lock held)."""
+        with open(self.path, "r+b") as f:
+            f.write(data)
+            f.truncate()
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+
+class JournalFile(File):
+    """A storage file where every change is appended as a new line.
+
+    `NAME=value` lines set and `-NAME` lines delete a config, the last line
+    for a name wins. A plain `File` is a valid journal, so existing storage
+    files can be switched over as they are.
+
+    Writes are appends, so the file keeps growing; it is compacted (rewritten
+    with only the live lines) once it is at least `compact_size` bytes and at
+    least `compact_ratio` of it was appended since the last compaction.
+    """
+
+    DELETE_REGEX = re.compile(r"^\s*-(.+?)\s*$")
+
+    def __init__(self, path, fsync=False, compact_size=64 * 1024, compact_ratio=0.5):
+        super().__init__(path, fsync=fsync)
+        self.compact_size = compact_size
+        self.compact_ratio = compact_ratio
+
+    @classmethod
+    def parse(cls, lines):
+        index = {}
+        for l in lines:
+            m = cls.ENV_REGEX.match(l)
+            if m:
+                index[m.group(1)] = m.group(2)
+                continue
+            m = cls.DELETE_REGEX.match(l)
+            if m:
+                index.pop(m.group(1), None)
+        return index
+
+    def write(self, changes):
+        records = "".join([
+            f"-{name}\n" if storagestr is None else f"{name}={storagestr}\n"
+            for name, storagestr in changes.items()
+        ]).encode()
+        with self.lock() as lockfd:
+            with open(self.path, "ab+") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size:
+                    # make sure the last line is terminated
+                    f.seek(size - 1)
+                    if f.read(1) != b"\n":
+                        records = b"\n" + records
+                f.write(records)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                size = os.fstat(f.fileno()).st_size
+            if size >= self.compact_size:
+                # the size after the last compaction is kept in the lock file
+                try:
+                    base = int(os.pread(lockfd, 32, 0))
+                except ValueError:
+                    base = 0
+                if size - base >= self.compact_ratio * size:
+                    with open(self.path, "r") as f:
+                        self._compact(lockfd, f.readlines())
+
+    def compact(self):
+        if not self.path.is_file():
+            return False
+        with self.lock() as lockfd:
+            with open(self.path, "r") as f:
+                return self._compact(lockfd, f.readlines())
+
+    def remove_lines(self, lockfd, lines, names):
+        self._compact(lockfd, lines, drop=names)
+
+    def _compact(self, lockfd, lines, drop=()):
+        index = self.parse(lines)
+        for name in drop:
+            index.pop(name, None)
+        newlines = []
+        done = set()
+        for l in lines:
+            m = self.ENV_REGEX.match(l) or self.DELETE_REGEX.match(l)
+            if not m:
+                newlines.append(l if l.endswith("\n") else l + "\n")
+                continue
+            name = m.group(1)
+            if name in index and name not in done:
+                newlines.append(f"{name}={index[name]}\n")
+                done.add(name)
+        compacted = newlines != lines
+        if compacted:
+            self.replace(newlines)
+        os.ftruncate(lockfd, 0)
+        os.pwrite(lockfd, str(sum(len(l.encode()) for l in newlines)).encode(), 0)
+        return compacted
+
+
+class SQLiteFile(Storage):
+    """A SQLite database storing configs in an indexed table.
+
+    The database runs in WAL mode, so readers are not blocked by a writer.
+    Use `import_dotenv` / `export_dotenv` to move configs between this and
+    the `NAME=value` files.
+    """
+
+    indexed = True
+
+    def __init__(self, path, fsync=False, timeout=30):
+        super().__init__(path)
+        self.fsync = fsync
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connect(self, create=False):
+        """Return the connection of the current thread, None if there is no db."""
+        try:
+            ino = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            ino = None
+        conn = getattr(self._local, "conn", None)
+        # reuse the connection unless the db was replaced or we were forked
+        if conn is not None and self._local.key == (os.getpid(), ino):
+            return conn
+        if ino is None and not create:
+            return None
+        import sqlite3
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS config "
+            "(name TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID"
+        )
+        self._local.conn = conn
+        self._local.key = (os.getpid(), os.stat(self.path).st_ino)
+        self._local.writes = 0
+        return conn
+
+    def ensure(self):
+        self.connect(create=True)
+
+    def watch_paths(self):
+        # committed transactions go to the write-ahead log first
+        return [self.path, self.path.with_name(f"{self.path.name}-wal")]
+
+    def _version(self, conn):
+        # data_version changes whenever another connection commits, the
+        # commits of this one (shared by every Config of the thread) are counted
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        return self._local.key, data_version, self._local.writes
+
+    def version(self):
+        conn = self.connect()
+        if conn is None:
+            return None
+        return self._version(conn)
+
+    def read(self):
+        conn = self.connect()
+        if conn is None:
+            return None, {}
+        with self.transaction(conn, "DEFERRED"):
+            version = self._version(conn)
+            index = dict(conn.execute("SELECT name, value FROM config"))
+        return version, index
+
+    def get(self, name):
+        conn = self.connect()
+        if conn is None:
+            return None
+        row = conn.execute("SELECT value FROM config WHERE name = ?", (name,)).fetchone()
+        return row and row[0]
+
+    def write(self, changes):
+        conn = self.connect(create=True)
+        with self.transaction(conn, "IMMEDIATE"):
+            conn.executemany(
+                "INSERT INTO config (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                [(n, v) for n, v in changes.items() if v is not None]
+            )
+            conn.executemany(
+                "DELETE FROM config WHERE name = ?",
+                [(n,) for n, v in changes.items() if v is None]
+            )
+        self._local.writes += 1
+
+    def compact(self):
+        conn = self.connect()
+        if conn is None:
+            return False
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        return True
+
+    def prune(self, keep, dry_run=False):
+        conn = self.connect()
+        if conn is None:
+            return []
+        with self.transaction(conn, "IMMEDIATE"):
+            stale = [
+                name for (name,) in conn.execute("SELECT name FROM config")
+                if name not in keep
+            ]
+            if not dry_run:
+                conn.executemany("DELETE FROM config WHERE name = ?", [(n,) for n in stale])
+        if stale and not dry_run:
+            self._local.writes += 1
+        return stale
+
+    @staticmethod
+    @contextlib.contextmanager
+    def transaction(conn, mode):
+        conn.execute(f"BEGIN {mode}")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
 
 class Section:
     def __init__(self):
@@ -36,13 +543,28 @@ class Service:
         self.mode = mode
         self.environ = environ
 
+    @property
+    def uid(self):
+        if isinstance(self.user, str):
+            return pwd.getpwnam(self.user).pw_uid
+        return self.user
+
+    @property
+    def gid(self):
+        if isinstance(self.group, str):
+            return grp.getgrnam(self.group).gr_gid
+        return self.group
 
-class Config:
-    ENV_REGEX = re.compile(r"^\s*([^#].*?)=(.*)$")
 
-    def __init__(self, config_module=None):
+class Config:
+    def __init__(self, config_module=None, secrets_dir="/run/secrets", validation_cache=None):
         # cli will pass config_module as None by default
         config_module = config_module or "gstack_conf"
+        self.secrets_dir = pathlib.Path(secrets_dir)
+        # a path: remember validation results between runs, see ValidationCache
+        self.validation_cache = None
+        if validation_cache is not None:
+            self.validation_cache = validation.ValidationCache(validation_cache)
         self.config_module = importlib.import_module(config_module)
 
         self.sections = [
@@ -51,13 +573,48 @@ class Config:
         ]
 
         self.fields = {}
+        self.files = []
         for s in self.sections:
-            for fn in s.fields:
+            for fn, fi in s.fields.items():
                 self.fields[fn] = s
+                if fi.file not in self.files:
+                    self.files.append(fi.file)
+
+        # parsed file contents: path -> (version, {name: raw})
+        self._snapshots = {}
+        # changes collected by an open transaction: file -> {name: raw}
+        self._pending = None
 
-    def ensure_file(self, file):
-        if not file.path.is_file():
-            open(file.path, "a").close()
+    def read_file(self, file):
+        """Return the name -> raw storage string index of `file`.
+
+        The file is only read again when its version (for `File` its inode,
+        mtime and size) changes.
+        """
+        version = file.version()
+        snapshot = self._snapshots.get(file.path)
+        if version is None:
+            self._snapshots.pop(file.path, None)
+            return {}
+        if snapshot and snapshot[0] == version:
+            return snapshot[1]
+        with instrument.timer("storage.read"):
+            version, index = file.read()
+        self._snapshots[file.path] = (version, index)
+        return index
+
+    def lookup(self, file, name):
+        """Return the raw storage string of `name` in `file`, None if not set."""
+        if file.indexed:
+            with instrument.timer("storage.get"):
+                return file.get(name)
+        return self.read_file(file).get(name)
+
+    def invalidate(self, file=None):
+        if file is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(file.path, None)
 
     def get_field(self, name):
         try:
@@ -68,103 +625,458 @@ class Config:
         else:
             return section, field
 
-    def retrieve(self, name, to_stream=False, validate=True):
+    def decode(self, field, storagestr):
+        if field.blob and storagestr.startswith(BLOB_PREFIX):
+            with self.open_blob(field.file, storagestr) as f:
+                return field.from_stream(f.read())
+        return field.from_storage(storagestr)
+
+    def validate(self, name, storagestr, value):
+        """Validate `value`, decoded from `storagestr`, using the validation cache if any."""
         _, field = self.get_field(name)
+        if self.validation_cache is None:
+            field.validate(value)
+        else:
+            self.validation_cache.validate(name, field, storagestr, value)
 
-        try:
-            with open(field.file.path, "r") as f:
-                lines = [l for l in f.readlines() if l]
-        except FileNotFoundError:
-            lines = []
+    def retrieve(self, name, to_stream=False, validate=True):
+        _, field = self.get_field(name)
 
-        for l in lines:
-            m = self.ENV_REGEX.match(l)
-            if m and m.group(1) == name:
-                value = field.from_storage(m.group(2))
-                if validate:
-                    field.validate(value)
-                if to_stream:
-                    return field.to_stream(value)
-                return value
+        storagestr = self.lookup(field.file, name)
+        if storagestr is not None:
+            value = self.decode(field, storagestr)
+            if validate:
+                self.validate(name, storagestr, value)
+            if to_stream:
+                return field.to_stream(value)
+            return value
         if field.default is None:
             raise exceptions.ConfigNotSetError(f"Config not set: {name}")
         raise exceptions.DefaultException(field.default)
 
+    def to_storage(self, name, value, from_stream=False, validate=True):
+        """Convert and validate `value`, return the field and the storage string.
+
+        The storage string is None if `value` is None (the config is deleted).
+        """
+        _, field = self.get_field(name)
+        if value is None:
+            return field, None
+        if from_stream:
+            value = field.from_stream(value)
+        if validate:
+            field.validate(value)
+        if field.blob:
+            return field, self.store_blob(field, io.BytesIO(field.to_stream(value)))
+        return field, field.to_storage(value)
+
     def set(self, name, value, from_stream=False, validate=True):
+        self.set_many({name: value}, from_stream=from_stream, validate=validate)
+
+    def set_file(self, name, f, validate=True):
+        """Set `name` to the content of the binary file object `f`.
+
+        The content of blob fields is streamed into the side-car file in
+        chunks, without reading it into memory.
+        """
         _, field = self.get_field(name)
-        self.ensure_file(field.file)
+        if not field.blob:
+            self.set(name, f.read(), from_stream=True, validate=validate)
+            return
+        ref = self.store_blob(field, f, validate=validate)
+        self.write_changes({field.file: {name: ref}})
 
-        if value is not None:
-            if from_stream:
-                value = field.from_stream(value)
+    def store_blob(self, field, f, validate=False):
+        """Copy the binary file object `f` into a blob, return the reference.
+
+        Blobs are named after the SHA-256 of their content. With `validate`
+        the field's validators get the content as a read-only mmap. Blobs get
+        the mode of the storage, and its owner when running as root, so who
+        can read the storage can read its blobs too.
+        """
+        field.file.ensure()
+        st = os.stat(field.file.path)
+        mode = stat.S_IMODE(st.st_mode) & 0o666
+        owner = (st.st_uid, st.st_gid) if os.geteuid() == 0 else None
+        blob_dir = field.file.blob_dir
+        blob_dir.mkdir(mode=0o700, exist_ok=True)
+        with contextlib.suppress(PermissionError):  # a directory of another user
+            # directories need the x bit where files have the r bit
+            os.chmod(blob_dir, 0o700 | mode | (mode & 0o444) >> 2)
+            if owner:
+                os.chown(blob_dir, *owner)
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=blob_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in iter(lambda: f.read(BLOB_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+                os.fchmod(out.fileno(), mode)
+                if owner:
+                    os.fchown(out.fileno(), *owner)
+                out.flush()
+                if field.file.fsync:
+                    os.fsync(out.fileno())
             if validate:
-                field.validate(value)
-            storagestr = field.to_storage(value)
-            actualline = f"{name}={storagestr}\n"
+                with open(tmp, "rb") as b:
+                    field.validate(map_file(b))
+            os.replace(tmp, blob_dir / digest.hexdigest())
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        return BLOB_PREFIX + digest.hexdigest()
 
-        newlines = []
-        done = False
-        with open(field.file.path, "r") as f:
-            lines = [l for l in f.readlines() if l]
-        for l in lines:
-            if done:  # if we are done, just append remaining lines
-                newlines.append(l)
+    def open_blob(self, file, ref):
+        digest = ref[len(BLOB_PREFIX):]
+        if not BLOB_DIGEST.fullmatch(digest):
+            raise ValueError(f"Invalid blob reference: {ref}")
+        try:
+            return open(file.blob_dir / digest, "rb")
+        except FileNotFoundError:
+            raise ValueError(f"Missing blob: {ref}")
+        except OSError as e:
+            raise ValueError(f"Unreadable blob: {ref}: {e.strerror}")
+
+    def retrieve_file(self, name, out, validate=False):
+        """Write the stream of `name` to the binary file object `out`.
+
+        Blobs are copied in chunks, without reading them into memory.
+        """
+        _, field = self.get_field(name)
+        storagestr = self.lookup(field.file, name)
+        if field.blob and storagestr is not None and storagestr.startswith(BLOB_PREFIX):
+            with self.open_blob(field.file, storagestr) as f:
+                if validate:
+                    field.validate(map_file(f))
+                shutil.copyfileobj(f, out, BLOB_CHUNK_SIZE)
+            return
+        stream = self.retrieve(name, to_stream=True, validate=validate)
+        out.write(stream.encode() if isinstance(stream, str) else stream)
+
+    def set_many(self, values, from_stream=False, validate=True):
+        """Set (or delete, if the value is None) several configs at once.
+
+        Every value is converted and validated before anything is written, and
+        each storage file is rewritten only once.
+        """
+        changes = {}
+        for name, value in values.items():
+            field, storagestr = self.to_storage(name, value, from_stream, validate)
+            changes.setdefault(field.file, {})[name] = storagestr
+        self.write_changes(changes)
+
+    def write_changes(self, changes):
+        """Write `changes` (file -> {name: storage string}) or add to the transaction."""
+        if self._pending is not None:
+            for file, file_changes in changes.items():
+                self._pending.setdefault(file, {}).update(file_changes)
+            return
+        for file, file_changes in changes.items():
+            self.write_file(file, file_changes)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Collect every `set` in the block and write them out at the end.
+
+        Nothing is written if the block raises an exception, and values set in
+        the block are not visible to `retrieve` before it ends. Nested
+        transactions are merged into the outermost one.
+        """
+        if self._pending is not None:
+            yield self
+            return
+        self._pending = {}
+        try:
+            yield self
+        except BaseException:
+            self._pending = None
+            raise
+        pending, self._pending = self._pending, None
+        for file, file_changes in pending.items():
+            self.write_file(file, file_changes)
+
+    def write_file(self, file, changes):
+        try:
+            with instrument.timer("storage.write"):
+                file.write(changes)
+        finally:
+            self.invalidate(file)
+
+    def compact(self):
+        """Compact every storage, return the storages actually changed.
+
+        Blobs no longer referenced (and not written in the last
+        `BLOB_GRACE_PERIOD` seconds, as those may be just being set) are
+        removed too.
+        """
+        compacted = []
+        for file in self.files:
+            changed = file.compact()
+            self.invalidate(file)
+            if self.remove_unused_blobs(file):
+                changed = True
+            if changed:
+                compacted.append(file)
+        return compacted
+
+    def remove_unused_blobs(self, file):
+        if not file.blob_dir.is_dir():
+            return []
+        _, index = file.read()
+        used = {
+            s[len(BLOB_PREFIX):] for s in index.values() if s.startswith(BLOB_PREFIX)
+        }
+        removed = []
+        limit = time.time() - BLOB_GRACE_PERIOD
+        for path in file.blob_dir.iterdir():
+            if path.name not in used and path.stat().st_mtime < limit:
+                path.unlink()
+                removed.append(path)
+        return removed
+
+    def resolve(self, name, validate=True):
+        """Like `retrieve`, but return the default instead of raising it."""
+        try:
+            return self.retrieve(name, validate=validate)
+        except exceptions.DefaultException as e:
+            return e.default
+
+    def service_path(self, service, name):
+        if service.path:
+            return pathlib.Path(service.path)
+        return self.secrets_dir / service.name / name
+
+    def provide(self, service=None, name=None, validate=True):
+        """Write the configs of `service` (or of every service) to files.
+
+        Every value is resolved before anything is written. Returns the paths
+        actually written: targets already having the same content hash, mode
+        and owner are left alone.
+        """
+        if name is not None:
+            self.get_field(name)
+        targets = []
+        for fn, section in self.fields.items():
+            if name is not None and fn != name:
                 continue
-            m = self.ENV_REGEX.match(l)
-            if m and m.group(1) == name:
-                done = True
-                if value is not None:  # if we delete, skip
-                    newlines.append(actualline)
-            else:
-                newlines.append(l)
-        if not done and value is not None:
-            newlines.append(actualline)
-        with open(field.file.path, "w") as f:
-            f.writelines(newlines)
+            for svc in section.fields[fn].services:
+                if svc.environ or (service is not None and svc.name != service):
+                    continue
+                targets.append((fn, svc))
+
+        data = {}
+        for fn, svc in targets:
+            if fn not in data:
+                _, field = self.get_field(fn)
+                stream = field.to_stream(self.resolve(fn, validate=validate))
+                data[fn] = stream.encode() if isinstance(stream, str) else stream
+
+        written = []
+        for fn, svc in targets:
+            path = self.service_path(svc, fn)
+            if self.write_target(path, data[fn], svc.mode, svc.uid, svc.gid):
+                written.append(path)
+        return written
+
+    def write_target(self, path, data, mode=None, uid=None, gid=None):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+        if (
+            st is not None and st.st_size == len(data) and
+            (mode is None or stat.S_IMODE(st.st_mode) == mode) and
+            (uid is None or st.st_uid == uid) and
+            (gid is None or st.st_gid == gid)
+        ):
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(64 * 1024), b""):
+                    digest.update(chunk)
+            if digest.digest() == hashlib.sha256(data).digest():
+                return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, data, mode=mode, uid=uid, gid=gid)
+        return True
 
-    def provide(self, service, name=None, validate=True):
-        pass
+    def use(self, service, name=None, validate=True):
+        """Return the environment (name -> str) of `service`.
 
-    def use(self, service, name):
-        pass
+        It contains every field listing `service` with `environ=True`, or only
+        `name` if given.
+        """
+        if name is not None:
+            self.get_field(name)
+        env = {}
+        for fn, section in self.fields.items():
+            if name is not None and fn != name:
+                continue
+            field = section.fields[fn]
+            if not any(svc.environ and svc.name == service for svc in field.services):
+                continue
+            if field.binary:
+                raise exceptions.ImproperlyConfigured(
+                    f"{fn} is binary, it can not be used as an environment variable"
+                )
+            env[fn] = field.to_stream(self.resolve(fn, validate=validate))
+        return env
+
+    def compile(self, path, validate=True, mode=0o400):
+        """Write a snapshot of the streams of every config to `path`.
+
+        Configs not set and without a default are left out. Nothing is written
+        if any value is illegal or (with `validate`) invalid. Load it with
+        `snapshot.load`.
+        """
+        values = {}
+        errors = {}
+        for fn in self.fields:
+            _, field = self.get_field(fn)
+            try:
+                values[fn] = field.to_stream(self.resolve(fn, validate=validate))
+            except exceptions.ConfigNotSetError:
+                pass
+            except (exceptions.ValidationError, ValueError) as e:
+                errors[fn] = e
+        if errors:
+            raise exceptions.ValidationError(errors)
+        atomic_write(path, snapshot.dumps(values), mode=mode)
+
+    def current_value(self, name):
+        """Return the value (or default) of `name`, None if not set or illegal."""
+        try:
+            return self.resolve(name, validate=False)
+        except (exceptions.ConfigNotSetError, ValueError):
+            return None
+
+    def watch(self, callback, names=None, interval=1.0, debounce=0.1, poll=False, stop=None):
+        """Call `callback(name, old, new)` whenever the value of a config changes.
+
+        Watches the storages of `names` (every config by default) with
+        inotify, or by polling every `interval` seconds if that is not
+        available. A burst of writes is handled once, after `debounce` quiet
+        seconds: the changed storages are read again, and only the configs
+        whose storage string changed are decoded and compared. Values are as
+        in `current_value`. Runs until the `stop` event (if any) is set.
+        """
+        names = list(self.fields if names is None else names)
+        fields = {name: self.get_field(name)[1] for name in names}
+        files = []
+        for field in fields.values():
+            if field.file not in files:
+                files.append(field.file)
+        paths = {
+            pathlib.Path(p).absolute(): file for file in files for p in file.watch_paths()
+        }
+
+        raw = {name: self.lookup(field.file, name) for name, field in fields.items()}
+        values = {name: self.current_value(name) for name in names}
+        with watch.watcher(paths, interval=interval, poll=poll) as watcher:
+            while stop is None or not stop.is_set():
+                changed = watcher.wait(timeout=interval, debounce=debounce)
+                changed_files = {paths[p] for p in changed}
+                for file in changed_files:
+                    self.invalidate(file)
+                for name, field in fields.items():
+                    if field.file not in changed_files:
+                        continue
+                    storagestr = self.lookup(field.file, name)
+                    if storagestr == raw[name]:
+                        continue
+                    raw[name] = storagestr
+                    value = self.current_value(name)
+                    if value != values[name]:
+                        callback(name, values[name], value)
+                        values[name] = value
+
+    def info(self, verbosity=0, workers=None):
+        """Return the status of every config, grouped by sections.
+
+        With `workers` the fields are decoded and validated in a thread pool
+        of that size; the result is the same as without it.
+        """
+        if workers and workers > 1:
+            # parse every storage up front instead of in every thread
+            for file in self.files:
+                if not file.indexed:
+                    self.read_file(file)
+            import concurrent.futures
+            with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                ret = self._info(executor.map)
+        else:
+            ret = self._info(map)
+        if self.validation_cache is not None:
+            self.validation_cache.save()
+        return ret
 
-    def info(self, verbosity=0):
+    def _info(self, map):
+        config_infos = iter(map(self.field_info, [fn for s in self.sections for fn in s.fields]))
         ret = []
         for s in self.sections:
             section_info = {}
             ret.append(section_info)
             section_info["section"] = s.__class__.__name__
             section_info["help_text"] = format_docstring(s.__class__.__doc__)
-            section_info["config_items"] = config_items = []
-            # cons.print(s.info(verbosity))
-            for fn, fi in s.fields.items():
-                config_info = {}
-                config_items.append(config_info)
-                config_info["field"] = fn
-                config_info["help_text"] = fi.help_text
-                config_info["errors"] = []
-                try:
-                    value = self.retrieve(fn, validate=False)
-                except exceptions.DefaultException as e:
-                    config_info["reportable"] = fi.reportable(e.default)
-                    config_info["status"] = "DEFAULT"
-                except exceptions.ConfigNotSetError as e:
-                    config_info["reportable"] = ""
-                    config_info["status"] = "NOT SET"
-                except ValueError as e:
-                    config_info["reportable"] = ""
-                    config_info["status"] = "ILLEGAL"
-                else:
-                    try:
-                        fi.validate(value)
-                    except exceptions.ValidationError as e:
-                        config_info["reportable"] = fi.reportable(value)
-                        config_info["status"] = "INVALID"
-                        config_info["errors"] = e.messages
-                    else:
-                        config_info["reportable"] = fi.reportable(value)
-                        config_info["status"] = "OK"
+            section_info["config_items"] = [next(config_infos) for _ in s.fields]
         return ret
 
-    def remove_stale(self):
-        pass
+    def field_info(self, fn):
+        _, fi = self.get_field(fn)
+        config_info = {}
+        config_info["field"] = fn
+        config_info["help_text"] = fi.help_text
+        config_info["errors"] = []
+        storagestr = self.lookup(fi.file, fn)
+        try:
+            if storagestr is None:
+                if fi.default is None:
+                    raise exceptions.ConfigNotSetError(f"Config not set: {fn}")
+                raise exceptions.DefaultException(fi.default)
+            value = self.decode(fi, storagestr)
+        except exceptions.DefaultException as e:
+            config_info["reportable"] = fi.reportable(e.default)
+            config_info["status"] = "DEFAULT"
+        except exceptions.ConfigNotSetError as e:
+            config_info["reportable"] = ""
+            config_info["status"] = "NOT SET"
+        except ValueError as e:
+            config_info["reportable"] = ""
+            config_info["status"] = "ILLEGAL"
+        else:
+            try:
+                self.validate(fn, storagestr, value)
+            except exceptions.ValidationError as e:
+                config_info["reportable"] = fi.reportable(value)
+                config_info["status"] = "INVALID"
+                config_info["errors"] = e.messages
+            else:
+                config_info["reportable"] = fi.reportable(value)
+                config_info["status"] = "OK"
+        return config_info
+
+    def remove_stale(self, dry_run=False):
+        """Remove the configs no longer defined from every storage.
+
+        Each storage is scanned and rewritten once. Returns a dict mapping the
+        storages to the names removed (or to be removed if `dry_run`).
+        """
+        removed = {}
+        for file in self.files:
+            stale = file.prune(self.fields, dry_run=dry_run)
+            if stale:
+                removed[file] = stale
+            if not dry_run:
+                self.invalidate(file)
+        return removed
+
+
+def __getattr__(name):
+    # asyncio is only imported when AsyncConfig is used
+    if name == "AsyncConfig":
+        from .aio import AsyncConfig
+        return AsyncConfig
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,15 +1,68 @@
 import base64
-from email import utils as email_utils
+import collections
+import threading
 
 from . import exceptions
+from . import instrument
 from . import validators
 
 
+class DecodeCache:
+    """A bounded LRU cache of decoded values, keyed on (field, storage string).
+
+    Storage strings longer than `max_length` are not cached.
+    """
+
+    def __init__(self, maxsize=256, max_length=1024 * 1024):
+        self.maxsize = maxsize
+        self.max_length = max_length
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, field, storage_str):
+        """Return a (found, value) pair."""
+        with self._lock:
+            try:
+                value = self._data[(field, storage_str)]
+            except KeyError:
+                self.misses += 1
+                return False, None
+            self._data.move_to_end((field, storage_str))
+            self.hits += 1
+            return True, value
+
+    def put(self, field, storage_str, value):
+        if self.maxsize <= 0 or len(storage_str) > self.max_length:
+            return
+        with self._lock:
+            self._data[(field, storage_str)] = value
+            self._data.move_to_end((field, storage_str))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        return {
+            "hits": self.hits, "misses": self.misses,
+            "size": len(self._data), "maxsize": self.maxsize,
+        }
+
+
 class Field:
     """Base class for specific config fields."""
 
     binary = False
+    blob = False
     default_validators = []
+    # shared by every field, see `from_storage`
+    decode_cache = DecodeCache()
 
     def __init__(
         self, file, hide=False, b64=False, default=None, help_text=None,
@@ -50,6 +103,15 @@ class Field:
         raise NotImplementedError()
 
     def from_storage(self, storage_str):
+        with instrument.timer("field.from_storage"):
+            found, value = self.decode_cache.get(self, storage_str)
+            if not found:
+                value = self.decode(storage_str)
+                self.decode_cache.put(self, storage_str, value)
+        # do not let the caller modify the cached list
+        return list(value) if isinstance(value, list) else value
+
+    def decode(self, storage_str):
         if self.hide or self.binary or self.b64:
             stream = base64.b64decode(storage_str)
             if not self.binary:
@@ -71,13 +133,27 @@ class Field:
     def validate(self, value):
         errors = []
         for validator in self.validators:
+            name = getattr(validator, "__name__", type(validator).__name__)
             try:
-                validator(value)
+                with instrument.timer(f"validator.{name}"):
+                    validator(value)
             except exceptions.ValidationError as e:
                 errors.append(e)
         if errors:
             raise exceptions.ValidationError(errors)
 
+    def validation_expiry(self, value):
+        """Return the timestamp when the validation result of `value` may change.
+
+        None if it never does. Validators with a time dependent result tell it
+        by their `cache_expiry` method.
+        """
+        expiries = [
+            validator.cache_expiry(value) for validator in self.validators
+            if hasattr(validator, "cache_expiry")
+        ]
+        return min([e for e in expiries if e is not None], default=None)
+
     def human_readable(self, value):
         return str(value)
 
@@ -129,6 +205,10 @@ class ListMixin:
         if errors:
             raise exceptions.ValidationError(errors)
 
+    def validation_expiry(self, value):
+        expiries = [super(ListMixin, self).validation_expiry(v) for v in value]
+        return min([e for e in expiries if e is not None], default=None)
+
 
 class StringField(MaxMinLengthMixin, Field):
     def from_str(self, s):
@@ -172,8 +252,19 @@ class BooleanField(Field):
 
 
 class FileField(MaxMinLengthMixin, Field):
+    """A binary file.
+
+    With `blob=True` the content is kept in a side-car file named after its
+    hash, and only the reference goes into the storage. Validators of blob
+    fields may get a read-only mmap instead of bytes.
+    """
+
     binary = True
 
+    def __init__(self, *args, blob=False, **kwargs):
+        self.blob = blob
+        super().__init__(*args, **kwargs)
+
     def from_bytes(self, b):
         return b
 
@@ -188,6 +279,7 @@ class EmailField(Field):
     default_validators = [validators.EmailValidator()]
 
     def from_str(self, s):
+        from email import utils as email_utils  # slow to import, rarely needed
         return email_utils.parseaddr(s)
 
     def to_str(self, value):
@@ -208,7 +300,10 @@ class HostNameField(StringField):
 
 
 class HostNameListField(ListMixin, HostNameField):
-    pass
+    def index(self, value):
+        """Return a `hostindex.HostIndex` of the names in `value` for bulk look-ups."""
+        from . import hostindex
+        return hostindex.HostIndex(value)
 
 
 class IPField(StringField):
@@ -219,37 +314,73 @@ class IPListField(ListMixin, IPField):
     pass
 
 
-class SSLPrivateKeyField(Field):
+class IPSetField(Field):
+    """A set of IP addresses, networks and `first-last` ranges.
+
+    The value is an `ipset.IPSet`; lists of entries are accepted on `set`.
+    Overlapping and adjacent entries are merged in the storage.
+    """
+
+    def from_str(self, s):
+        from . import ipset
+        return ipset.IPSet(s)
+
+    def to_str(self, value):
+        from . import ipset
+        if not isinstance(value, ipset.IPSet):
+            value = ipset.IPSet(value)
+        return str(value)
+
+
+class KeyTypesMixin:
+    """`key_types`: the allowed types of the key, see `keys.KEY_TYPES`."""
+
+    def __init__(self, *args, key_types=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if key_types is not None:
+            self.validators.append(validators.KeyTypeValidator(key_types))
+
+
+class SSLPrivateKeyField(KeyTypesMixin, Field):
     binary = True
 
     def __init__(self, *args, **kwargs):
-        if "secret" in kwargs and not kwargs["secret"]:
-            raise exceptions.InvalidUsage("SSLPrivateKey must always be a secret.")
-        kwargs["secret"] = True
+        if "hide" in kwargs and not kwargs["hide"]:
+            raise exceptions.InvalidUsage("SSLPrivateKey must always be hidden.")
+        kwargs["hide"] = True
         super().__init__(*args, **kwargs)
 
     def from_bytes(self, b):
-        return crypto.load_privatekey(SSL.FILETYPE_PEM, b)
+        from OpenSSL import crypto
+        return crypto.load_privatekey(crypto.FILETYPE_PEM, b)
 
     def to_bytes(self, value):
-        return crypto.dump_privatekey(SSL.FILETYPE_PEM, value)
+        from OpenSSL import crypto
+        return crypto.dump_privatekey(crypto.FILETYPE_PEM, value)
 
     def human_readable(self, value):
-        return f"SSL private key, bitsize: {value.bits()}"
+        from . import keys
+        return f"SSL private key, {keys.describe(value)}"
 
 
-class SSLCertificateField(Field):
+class SSLCertificateField(KeyTypesMixin, Field):
     binary = True
     default_validators = [validators.CertificateExpiryValidator()]
 
     def from_bytes(self, b):
-        cert = crypto.load_certificate(SSL.FILETYPE_PEM, b)
-        return cert
+        from OpenSSL import crypto
+        return crypto.load_certificate(crypto.FILETYPE_PEM, b)
 
     def to_bytes(self, value):
-        return crypto.dump_certificate(SSL.FILETYPE_PEM, value)
+        from OpenSSL import crypto
+        return crypto.dump_certificate(crypto.FILETYPE_PEM, value)
 
     def human_readable(self, value):
+        from . import cert
+        from . import keys
         sanlist = cert.get_alt_names(value)
         simplelist = ", ".join([x[1] for x in sanlist])
-        return f"certificate for {simplelist}; valid until {cert.expiry(value)} UTC"
+        return (
+            f"certificate for {simplelist}; {keys.describe(value.get_pubkey())} key; "
+            f"valid until {cert.expiry(value)} UTC"
+        )
@@ -0,0 +1,99 @@
+"""Host name matching against many names and wildcards at once.
+
+    >>> index = HostIndex(["example.com", "*.example.com", "10.0.0.1"])
+    >>> index.covered(["example.com", "www.example.com", "a.b.example.com", "10.0.0.1"])
+    ['example.com', 'www.example.com', '10.0.0.1']
+
+Patterns are stored in a trie keyed on their labels in reverse order, so a
+look-up takes one step per label of the host name, however many patterns
+there are. Matching follows RFC 6125 6.4.3 the way `ssl.match_hostname` did:
+names are compared case-insensitively, a wildcard is only allowed as the
+whole leftmost label and matches exactly one non-empty label, and IP
+addresses only match IP address patterns. Malformed wildcards never match.
+"""
+import ipaddress
+
+
+def parse_ip(name):
+    # failing ipaddress.ip_address is slow, skip it on most host names
+    if ":" not in name and not name[-1:].isdigit():
+        return None
+    try:
+        ip = ipaddress.ip_address(name)
+    except ValueError:
+        return None
+    # ssl did not accept scoped IPv6 addresses either
+    return None if getattr(ip, "scope_id", None) else ip
+
+
+class Node:
+    __slots__ = ("children", "exact", "wildcard")
+
+    def __init__(self):
+        self.children = {}
+        self.exact = None  # the pattern ending here
+        self.wildcard = None  # the "*." + ... pattern whose remainder ends here
+
+
+class HostIndex:
+    def __init__(self, patterns=()):
+        self.root = Node()
+        self.ips = {}
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add_ip(self, ip):
+        ip = ipaddress.ip_address(ip.rstrip() if isinstance(ip, str) else ip)
+        self.ips.setdefault(ip, str(ip))
+
+    def add(self, pattern):
+        """Add a host name, a wildcard (`*.example.com`) or an IP address."""
+        if parse_ip(pattern) is not None:
+            self.add_ip(pattern)
+        else:
+            self.add_name(pattern)
+
+    def add_name(self, pattern):
+        """Add a DNS name or wildcard, even if it looks like an IP address.
+
+        Like DNS names of certificates: they never match IP addresses.
+        """
+        if not pattern:
+            return
+        wildcard = "*" in pattern
+        labels = pattern.lower().split(".")
+        if wildcard:
+            if labels[0] != "*" or len(labels) < 2 or "*" in pattern[1:]:
+                return  # malformed, never matches
+            labels = labels[1:]
+        node = self.root
+        for label in reversed(labels):
+            node = node.children.setdefault(label, Node())
+        if wildcard:
+            node.wildcard = node.wildcard or pattern
+        else:
+            node.exact = node.exact or pattern
+
+    def match(self, name):
+        """Return the pattern matching `name`, or None."""
+        ip = parse_ip(name)
+        if ip is not None:
+            return self.ips.get(ip)
+        labels = name.lower().split(".")
+        node = self.root
+        for i in range(len(labels) - 1, -1, -1):
+            if i == 0 and labels[0] and node.wildcard:
+                wildcard = node.wildcard
+            else:
+                wildcard = None
+            node = node.children.get(labels[i])
+            if node is None:
+                return wildcard
+        return node.exact or wildcard
+
+    def __contains__(self, name):
+        return self.match(name) is not None
+
+    def covered(self, names):
+        """Return the names (in order) matched by any pattern."""
+        return [name for name in names if self.match(name) is not None]
@@ -0,0 +1,89 @@
+"""Timing counters for the hot paths of gstackutils.
+
+Disabled by default. Once enabled, every `timer` block adds its duration to
+the counter of its phase and is passed to the registered callbacks:
+
+    instrument.enable()
+    instrument.add_callback(lambda phase, seconds: ...)
+    ...
+    print(instrument.to_json())
+"""
+import contextlib
+import json
+import threading
+import time
+
+
+enabled = False
+_counters = {}  # phase -> [count, total seconds]
+_callbacks = []
+_lock = threading.Lock()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+
+
+def add_callback(callback):
+    """Call `callback(phase, seconds)` after every timed block."""
+    _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    _callbacks.remove(callback)
+
+
+def record(phase, seconds):
+    with _lock:
+        counter = _counters.setdefault(phase, [0, 0.0])
+        counter[0] += 1
+        counter[1] += seconds
+    for callback in _callbacks:
+        callback(phase, seconds)
+
+
+@contextlib.contextmanager
+def timer(phase):
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def counters():
+    """Return {phase: {"count": ..., "seconds": ...}}."""
+    with _lock:
+        return {
+            phase: {"count": count, "seconds": seconds}
+            for phase, (count, seconds) in sorted(_counters.items())
+        }
+
+
+def to_json():
+    return json.dumps(counters(), indent=2)
+
+
+def report():
+    """Return the counters as a human readable table."""
+    lines = [f"{'phase':<40} {'count':>8} {'total ms':>10} {'mean ms':>10}"]
+    for phase, c in counters().items():
+        lines.append(
+            f"{phase:<40} {c['count']:>8} {c['seconds'] * 1000:>10.3f} "
+            f"{c['seconds'] * 1000 / c['count']:>10.3f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,130 @@
+"""A set of IPv4 and IPv6 addresses, stored as sorted, merged intervals.
+
+    >>> s = IPSet(["10.0.0.0/8", "192.168.1.1", "192.168.1.2", "10.1.0.0/16"])
+    >>> str(s)
+    '10.0.0.0/8,192.168.1.1-192.168.1.2'
+    >>> "10.20.30.40" in s
+    True
+
+Entries are addresses, networks (host bits are ignored) or `first-last`
+ranges. Membership is a binary search among the intervals of the version.
+"""
+import array
+import bisect
+import ipaddress
+
+
+SEPARATOR = ","
+
+
+def parse_entry(entry):
+    """Return (version, first, last) of an entry as integers."""
+    if isinstance(entry, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+        return entry.version, int(entry), int(entry)
+    if isinstance(entry, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+        return entry.version, int(entry.network_address), int(entry.broadcast_address)
+    entry = entry.strip()
+    if "-" in entry:
+        first, _, last = entry.partition("-")
+        first, last = ipaddress.ip_address(first.strip()), ipaddress.ip_address(last.strip())
+        if first.version != last.version:
+            raise ValueError(f"{entry!r} mixes IPv4 and IPv6")
+        if first > last:
+            raise ValueError(f"{entry!r} is an empty range")
+        return first.version, int(first), int(last)
+    network = ipaddress.ip_network(entry, strict=False)
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+def _array(version, values):
+    # IPv6 addresses do not fit in a machine word
+    return array.array("Q", values) if version == 4 else list(values)
+
+
+def merge(intervals):
+    """Sort `intervals` ((first, last) pairs), merge the overlapping and adjacent ones."""
+    merged = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1][1] = last
+        else:
+            merged.append([first, last])
+    return merged
+
+
+class IPSet:
+    """An immutable set of IP addresses."""
+
+    def __init__(self, entries=()):
+        if isinstance(entries, str):
+            entries = [e for e in entries.split(SEPARATOR) if e.strip()]
+        intervals = {4: [], 6: []}
+        for entry in entries:
+            version, first, last = parse_entry(entry)
+            intervals[version].append((first, last))
+        # parallel arrays of the first and last addresses of every interval
+        self._firsts = {}
+        self._lasts = {}
+        for version, ivs in intervals.items():
+            merged = merge(ivs)
+            self._firsts[version] = _array(version, (first for first, _ in merged))
+            self._lasts[version] = _array(version, (last for _, last in merged))
+
+    def __contains__(self, address):
+        if not isinstance(address, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+            try:
+                address = ipaddress.ip_address(address)
+            except ValueError:
+                return False
+        n = int(address)
+        i = bisect.bisect_right(self._firsts[address.version], n) - 1
+        return i >= 0 and n <= self._lasts[address.version][i]
+
+    def intervals(self):
+        """Yield the (first, last) address pairs, IPv4 first."""
+        for version, cls in ((4, ipaddress.IPv4Address), (6, ipaddress.IPv6Address)):
+            for first, last in zip(self._firsts[version], self._lasts[version]):
+                yield cls(first), cls(last)
+
+    def networks(self):
+        """Yield the fewest networks covering exactly the set."""
+        for first, last in self.intervals():
+            yield from ipaddress.summarize_address_range(first, last)
+
+    def entries(self):
+        """Yield the shortest entry of every interval: an address, a network or a range."""
+        for first, last in self.intervals():
+            if first == last:
+                yield str(first)
+                continue
+            networks = list(ipaddress.summarize_address_range(first, last))
+            yield str(networks[0]) if len(networks) == 1 else f"{first}-{last}"
+
+    def num_addresses(self):
+        return sum(
+            last - first + 1
+            for version in (4, 6)
+            for first, last in zip(self._firsts[version], self._lasts[version])
+        )
+
+    def __len__(self):
+        """The number of intervals."""
+        return len(self._firsts[4]) + len(self._firsts[6])
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __eq__(self, other):
+        if not isinstance(other, IPSet):
+            return NotImplemented
+        return self._firsts == other._firsts and self._lasts == other._lasts
+
+    def __hash__(self):
+        return hash(tuple(self.intervals()))
+
+    def __str__(self):
+        return SEPARATOR.join(self.entries())
+
+    def __repr__(self):
+        return f"IPSet({str(self)!r})"
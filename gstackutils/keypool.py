@@ -0,0 +1,103 @@
+"""A directory of private keys generated ahead of time.
+
+Generating RSA keys is the slowest step of `cert.generate`. `gstack cert
+keypool fill N` generates them in parallel beforehand, and `generate` takes
+them from the pool, or generates them inline if the pool is empty.
+
+The pool is $GSTACK_KEYPOOL, or ~/.cache/gstack/keypool. Keys in a directory
+others can access are not trusted, the pool is then taken for empty.
+"""
+import concurrent.futures
+import os
+import pathlib
+import uuid
+
+from OpenSSL import crypto
+
+from . import conf
+from . import exceptions
+from . import keys
+
+
+DEFAULT_DIR = "~/.cache/gstack/keypool"
+
+
+def default_path():
+    return pathlib.Path(os.environ.get("GSTACK_KEYPOOL") or DEFAULT_DIR).expanduser()
+
+
+def generate_pem(key_type, key_size):
+    return crypto.dump_privatekey(crypto.FILETYPE_PEM, keys.generate(key_type, key_size))
+
+
+class KeyPool:
+    """The keys of one type (and size) in a subdirectory of the pool."""
+
+    def __init__(self, path=None, key_type="rsa", key_size=None):
+        self.root = pathlib.Path(path) if path else default_path()
+        self.key_type = key_type
+        self.key_size = keys.key_size(key_type, key_size)
+        self.path = self.root / (f"rsa-{self.key_size}" if key_type == "rsa" else key_type)
+
+    def accepts(self, key_type, key_size):
+        """Whether the keys of the pool are of `key_type` and `key_size`."""
+        return (self.key_type, self.key_size) == (key_type, keys.key_size(key_type, key_size))
+
+    def protected(self):
+        """Whether the pool directory exists and only its owner (we) can access it."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+    def keys(self):
+        if not self.protected():
+            return []
+        return sorted(self.path.glob("*.pem"))
+
+    def __len__(self):
+        return len(self.keys())
+
+    def create(self):
+        """Create the pool directory, refuse to use it if others can access it."""
+        for directory in (self.root, self.path):
+            directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not self.protected():
+            raise exceptions.InvalidUsage(f"{self.path} is accessible by others, not used")
+
+    def add(self, pem):
+        self.create()
+        conf.atomic_write(self.path / f"{uuid.uuid4().hex}.pem", pem, mode=0o600, fsync=True)
+
+    def fill(self, n, workers=None):
+        """Generate keys in `workers` processes until the pool has `n`.
+
+        Return the number of keys generated.
+        """
+        self.create()
+        missing = n - len(self)
+        if missing <= 0:
+            return 0
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            args = [self.key_type] * missing, [self.key_size] * missing
+            for pem in executor.map(generate_pem, *args):
+                self.add(pem)
+        return missing
+
+    def take(self):
+        """Remove a key from the pool and return it, None if the pool is empty."""
+        for path in self.keys():
+            # renaming is atomic: only one of the concurrent takers succeeds
+            claimed = path.with_name(f".{path.stem}.{os.getpid()}.taken")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            try:
+                with open(claimed, "rb") as f:
+                    pem = f.read()
+            finally:
+                os.unlink(claimed)
+            return crypto.load_privatekey(crypto.FILETYPE_PEM, pem)
+        return None
@@ -0,0 +1,107 @@
+"""Private key types of the generated certificates.
+
+The cryptography modules are imported by the functions, so the key types can
+be listed (for the command line) without loading OpenSSL.
+"""
+from . import exceptions
+
+
+KEY_TYPES = ("rsa", "ec-p256", "ec-p384", "ed25519")
+RSA_KEY_SIZE = 2048
+MIN_RSA_KEY_SIZE = 1024
+
+
+def key_size(key_type="rsa", size=None):
+    """Check `key_type` and return the key size to use: None for the non-RSA keys."""
+    if key_type not in KEY_TYPES:
+        raise exceptions.InvalidUsage(
+            f"unknown key type: {key_type}, choose from {', '.join(KEY_TYPES)}"
+        )
+    if key_type != "rsa":
+        if size is not None:
+            raise exceptions.InvalidUsage(f"the size of {key_type} keys is fixed")
+        return None
+    if size is None:
+        return RSA_KEY_SIZE
+    if size < MIN_RSA_KEY_SIZE:
+        raise exceptions.InvalidUsage(f"RSA keys should have at least {MIN_RSA_KEY_SIZE} bits")
+    return size
+
+
+def generate(key_type="rsa", size=None):
+    """Return a new `OpenSSL.crypto.PKey`."""
+    from OpenSSL import crypto
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+    size = key_size(key_type, size)
+    if key_type == "rsa":
+        key = crypto.PKey()
+        key.generate_key(crypto.TYPE_RSA, size)
+        return key
+    if key_type == "ed25519":
+        return crypto.PKey.from_cryptography_key(ed25519.Ed25519PrivateKey.generate())
+    curve = ec.SECP256R1() if key_type == "ec-p256" else ec.SECP384R1()
+    return crypto.PKey.from_cryptography_key(ec.generate_private_key(curve))
+
+
+def to_cryptography(key):
+    """Return the cryptography private key of the PKey `key`.
+
+    `PKey.to_cryptography_key` checks RSA keys, which takes longer than
+    signing with them; our keys were generated or loaded by OpenSSL already.
+    """
+    from OpenSSL import crypto
+    from cryptography.hazmat.primitives import serialization
+
+    if not isinstance(key, crypto.PKey):
+        return key
+    der = crypto.dump_privatekey(crypto.FILETYPE_ASN1, key)
+    try:
+        return serialization.load_der_private_key(der, None, unsafe_skip_rsa_key_validation=True)
+    except TypeError:  # cryptography < 39 does not check them either
+        return key.to_cryptography_key()
+
+
+def public_key(key):
+    """Return the cryptography public key of the PKey `key` (private or public)."""
+    from OpenSSL import crypto
+    from cryptography.hazmat.primitives import serialization
+
+    return serialization.load_der_public_key(crypto.dump_publickey(crypto.FILETYPE_ASN1, key))
+
+
+def key_type(key):
+    """Return the type (one of KEY_TYPES) of a PKey or cryptography key, None if other."""
+    from OpenSSL import crypto
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+    if isinstance(key, crypto.PKey):
+        key = public_key(key)
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "rsa"
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "ed25519"
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+        return {"secp256r1": "ec-p256", "secp384r1": "ec-p384"}.get(key.curve.name)
+    return None
+
+
+def describe(key):
+    """A short human readable description of a PKey, e.g. "RSA, 2048 bits"."""
+    pub = public_key(key)
+    kind = key_type(pub)
+    if kind == "rsa":
+        return f"RSA, {key.bits()} bits"
+    if kind == "ed25519":
+        return "Ed25519"
+    curve = getattr(pub, "curve", None)
+    if curve is not None:
+        return f"EC, curve {curve.name}"
+    return f"unknown type, {key.bits()} bits"
+
+
+def signature_hash(key):
+    """The hash algorithm to sign with `key`: None for Ed25519, which has its own."""
+    from cryptography.hazmat.primitives import hashes
+
+    return None if key_type(key) == "ed25519" else hashes.SHA256()
@@ -0,0 +1,94 @@
+"""Serve config values over a Unix domain socket.
+
+The protocol is one JSON object per line in both directions. Requests:
+
+    {"op": "get", "name": "NAME"}
+    {"op": "get_many", "names": ["NAME", ...]}
+    {"op": "info"}
+
+Responses have `"ok": true` and the `value`, `values` (name -> value) or
+`info` key, or `"ok": false` and an `error` message. Values are the streams
+of the configs (the default if not set); binary streams are sent as
+`{"base64": "..."}`. See `gstackutils.client`.
+"""
+import asyncio
+import base64
+import json
+import os
+
+from . import exceptions
+
+
+def encode(stream):
+    if isinstance(stream, bytes):
+        return {"base64": base64.b64encode(stream).decode()}
+    return stream
+
+
+class ConfigServer:
+    def __init__(self, config):
+        self.config = config
+
+    def get(self, name):
+        _, field = self.config.get_field(name)
+        return encode(field.to_stream(self.config.resolve(name, validate=False)))
+
+    def handle(self, request):
+        """Return the response to `request`."""
+        # the storages are read again only if they changed (see Config.read_file)
+        try:
+            op = request["op"]
+            if op == "get":
+                return {"ok": True, "value": self.get(request["name"])}
+            if op == "get_many":
+                return {"ok": True, "values": {n: self.get(n) for n in request["names"]}}
+            if op == "info":
+                return {"ok": True, "info": self.config.info()}
+            return {"ok": False, "error": f"Unknown operation: {op}"}
+        except exceptions.ConfigMissingError as e:
+            return {"ok": False, "error": f"No such config: {e}"}
+        except (exceptions.ConfigNotSetError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+        except (KeyError, TypeError) as e:
+            return {"ok": False, "error": f"Bad request: {e!r}"}
+
+    async def client_connected(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {"ok": False, "error": "Bad request: invalid JSON"}
+                else:
+                    # reading files and decoding must not block other clients
+                    response = await loop.run_in_executor(None, self.handle, request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path, mode=0o600, started=None):
+        """Serve on the socket at `path` forever.
+
+        `started` (an asyncio.Event), if given, is set once the socket listens.
+        """
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        server = await asyncio.start_unix_server(self.client_connected, path=path)
+        os.chmod(path, mode)
+        if started is not None:
+            started.set()
+        async with server:
+            await server.serve_forever()
+
+
+def serve(config, path, mode=0o600):
+    asyncio.run(ConfigServer(config).serve(path, mode=mode))
@@ -0,0 +1,108 @@
+"""Compiled, read-only config snapshots.
+
+A snapshot holds the already decoded and validated streams of the configs
+(see `Config.compile`). Loading one only needs the standard library, and the
+values are served straight from a shared read-only mmap, so processes
+forked from the same parent share the pages.
+
+Layout (little endian)::
+
+    header   magic, format version, entry count, offset of the index
+    data     the names and values, one after the other
+    index    for every entry: name offset, value offset, value length,
+             name length and kind (str or bytes)
+"""
+import mmap
+import struct
+
+
+MAGIC = b"GSTKSNAP"
+VERSION = 1
+HEADER = struct.Struct("<8sHxxIQ")
+ENTRY = struct.Struct("<QQQHB5x")
+
+KIND_STR = 0
+KIND_BYTES = 1
+
+
+def dumps(values):
+    """Return the snapshot of `values` (name -> str or bytes) as bytes."""
+    data = bytearray(HEADER.size)
+    entries = []
+    for name, value in values.items():
+        kind = KIND_STR if isinstance(value, str) else KIND_BYTES
+        if kind == KIND_STR:
+            value = value.encode()
+        name = name.encode()
+        name_offset = len(data)
+        data += name
+        entries.append(ENTRY.pack(name_offset, len(data), len(value), len(name), kind))
+        data += value
+    index_offset = len(data)
+    for entry in entries:
+        data += entry
+    HEADER.pack_into(data, 0, MAGIC, VERSION, len(entries), index_offset)
+    return bytes(data)
+
+
+class Snapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.mmap)
+        magic, version, count, index_offset = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a config snapshot: {path}")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        self.index = {}
+        for i in range(count):
+            name_offset, value_offset, length, name_length, kind = ENTRY.unpack_from(
+                self.buffer, index_offset + i * ENTRY.size
+            )
+            name = bytes(self.buffer[name_offset:name_offset + name_length]).decode()
+            self.index[name] = (kind, value_offset, length)
+
+    def get_bytes(self, name):
+        """Return the stream of `name` as a memoryview into the snapshot."""
+        _, offset, length = self.index[name]
+        return self.buffer[offset:offset + length]
+
+    def get(self, name, default=None):
+        """Return the stream of `name`: str for text, memoryview for binary configs."""
+        try:
+            kind, offset, length = self.index[name]
+        except KeyError:
+            return default
+        value = self.buffer[offset:offset + length]
+        if kind == KIND_STR:
+            return str(value, "utf-8")
+        return value
+
+    def __getitem__(self, name):
+        if name not in self.index:
+            raise KeyError(name)
+        return self.get(name)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        self.buffer.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load(path):
+    return Snapshot(path)
@@ -1,7 +1,14 @@
 from rich import console, text, table, box, padding, print
 
+from . import instrument
+
 
 def print_info(info, verbosity=0):
+    with instrument.timer("termout.print_info"):
+        _print_info(info, verbosity)
+
+
+def _print_info(info, verbosity=0):
     cons = console.Console()
     for section in info:
         cons.print()
@@ -0,0 +1,174 @@
+import hashlib
+import hmac
+import json
+import os
+import pathlib
+import secrets
+import threading
+import time
+
+from . import exceptions
+
+
+# bump it when the meaning of a cached result changes
+CACHE_VERSION = 2
+SECRET_SIZE = 32
+SIMPLE_TYPES = (str, int, float, bool, type(None))
+
+
+def _code_digest(code, h):
+    h.update(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            _code_digest(const, h)
+        else:
+            h.update(repr(const).encode())
+
+
+def _simple(v):
+    if isinstance(v, (tuple, list)):
+        return all(_simple(e) for e in v)
+    return isinstance(v, SIMPLE_TYPES)
+
+
+def _attrs(obj):
+    """The simple (reproducible) attributes of `obj` as a sorted list."""
+    return sorted((k, repr(v)) for k, v in vars(obj).items() if _simple(v))
+
+
+def validator_fingerprint(validator):
+    """A string that changes whenever `validator` may judge differently.
+
+    It covers the name of the validator, the bytecode of the function (or of
+    the ``__call__`` method) and the simple attributes of the instance.
+    """
+    h = hashlib.sha256()
+    func = validator if hasattr(validator, "__code__") else type(validator).__call__
+    kind = func if func is validator else type(validator)
+    h.update(f"{kind.__module__}.{kind.__qualname__}".encode())
+    if hasattr(func, "__code__"):
+        _code_digest(func.__code__, h)
+    if not hasattr(validator, "__code__") and hasattr(validator, "__dict__"):
+        h.update(repr(_attrs(validator)).encode())
+    return h.hexdigest()
+
+
+def field_fingerprint(field):
+    h = hashlib.sha256()
+    cls = type(field)
+    h.update(f"{cls.__module__}.{cls.__qualname__}".encode())
+    h.update(repr(_attrs(field)).encode())
+    for validator in field.validators:
+        h.update(validator_fingerprint(validator).encode())
+    return h.hexdigest()
+
+
+class ValidationCache:
+    """Validation results stored in a JSON file, keyed on the stored value.
+
+    A result is reused while the storage string of the config, the field and
+    its validators are unchanged, and the result has not expired (see
+    `Field.validation_expiry`). Only the last result is kept for every config.
+
+    The keys are HMACs with a random secret kept next to the cache (in
+    `<path>.key`), so the cache gives no way to guess hidden values offline.
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.secret_path = self.path.with_name(f"{self.path.name}.key")
+        self.secret = self.load_secret()
+        self.new_secret = self.secret is None
+        if self.new_secret:
+            self.secret = secrets.token_bytes(SECRET_SIZE)
+        # results keyed with another secret never match
+        self.entries = {} if self.new_secret else self.load()
+        self.dirty = set()
+        self.fingerprints = {}
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def load_secret(self):
+        try:
+            with open(self.secret_path, "rb") as f:
+                secret = f.read()
+        except FileNotFoundError:
+            return None
+        return secret if len(secret) == SECRET_SIZE else None
+
+    def save_secret(self):
+        """Write the new secret, return False if another process wrote one first."""
+        try:
+            fd = os.open(self.secret_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            self.secret = self.load_secret() or self.secret
+            return False
+        with os.fdopen(fd, "wb") as f:
+            f.write(self.secret)
+        self.new_secret = False
+        return True
+
+    def key(self, name, field, storagestr):
+        fingerprint = self.fingerprints.get(id(field))
+        if fingerprint is None:
+            fingerprint = self.fingerprints[id(field)] = field_fingerprint(field)
+        h = hmac.new(self.secret, digestmod=hashlib.sha256)
+        for part in (str(CACHE_VERSION), name, fingerprint, storagestr):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def validate(self, name, field, storagestr, value):
+        """Validate `value` (decoded from `storagestr`) unless a valid result is cached."""
+        key = self.key(name, field, storagestr)
+        entry = self.entries.get(name)
+        if (
+            entry is not None and entry["key"] == key and
+            (entry["expires"] is None or entry["expires"] > time.time())
+        ):
+            self.hits += 1
+            if entry["errors"]:
+                raise exceptions.ValidationError(entry["errors"])
+            return
+        self.misses += 1
+        try:
+            field.validate(value)
+        except exceptions.ValidationError as e:
+            self.store(name, key, e.messages, field.validation_expiry(value))
+            raise
+        self.store(name, key, [], field.validation_expiry(value))
+
+    def store(self, name, key, errors, expires):
+        with self.lock:
+            self.entries[name] = {"key": key, "errors": errors, "expires": expires}
+            self.dirty.add(name)
+
+    def save(self):
+        """Write the new results, keeping those saved meanwhile by others."""
+        from .conf import atomic_write
+
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(self.path.parent, exist_ok=True)
+            if self.new_secret and not self.save_secret():
+                # our results are keyed with a secret nobody else knows
+                self.entries = self.load()
+                self.dirty = set()
+                return
+            entries = self.load()
+            entries.update({name: self.entries[name] for name in self.dirty})
+            self.entries = entries
+            self.dirty = set()
+        data = json.dumps({"version": CACHE_VERSION, "entries": entries}, sort_keys=True)
+        atomic_write(self.path, data.encode(), mode=0o600)
@@ -1,10 +1,9 @@
 # import subprocess
 # import os
-import re
 import datetime
+import string
 
 from . import exceptions
-from . import cert
 
 
 class MinLengthValidator:
@@ -59,18 +58,47 @@ class LowercaseOnly:
             )
 
 
-class HostNameValidator:
-    host_re = (
-        r"^(([a-zA-Z0-9]|[a-zA-Z0-9][a-zA-Z0-9\-]*[a-zA-Z0-9])\.)*"
-        r"([A-Za-z0-9]|[A-Za-z0-9][A-Za-z0-9\-]*[A-Za-z0-9])$"
-    )
+# The validators below scan their input once instead of matching regular
+# expressions: the old expressions backtracked exponentially on some inputs.
+# benchmarks/validators.py keeps them for comparison.
+
+HOST_CHARS = frozenset(string.ascii_letters + string.digits + "-")
+DIGITS = frozenset(string.digits)
+
+
+def _strip_newline(value):
+    # the regular expressions ended with "$", which also matches before a
+    # trailing newline
+    return value[:-1] if value.endswith("\n") else value
+
+
+def is_host_name(value):
+    for label in value.split("."):
+        if not label or label[0] == "-" or label[-1] == "-":
+            return False
+        if not HOST_CHARS.issuperset(label):
+            return False
+    return True
+
 
+def is_ip(value):
+    octets = value.split(".")
+    if len(octets) != 4:
+        return False
+    for octet in octets:
+        if not octet or len(octet) > 3 or not DIGITS.issuperset(octet):
+            return False
+        if (octet[0] == "0" and len(octet) > 1) or int(octet) > 255:
+            return False
+    return True
+
+
+class HostNameValidator:
     def __init__(self, ip_ok=False):
         self.ip_ok = ip_ok
 
     def __call__(self, value):
-        m = re.match(self.host_re, value)
-        if not m:
+        if not is_host_name(_strip_newline(value)):
             if self.ip_ok:
                 try:
                     IPValidator()(value)
@@ -81,81 +109,144 @@ class HostNameValidator:
 
 
 class IPValidator:
-    ip_re = (
-        r"^(([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.){3}"
-        r"([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])$"
-    )
-
     def __init__(self, range=False):
         self.range = range
-        if range:
-            self.ip_re = self.ip_re[:-1] + r"/(.+)$"
 
     def __call__(self, value):
-        m = re.match(self.ip_re, value)
-        if not m:
-            raise exceptions.ValidationError(f"invalid IP{' range' if self.range else ''}")
-        if self.range:
-            try:
-                r = int(m.group(4))
-            except ValueError:
-                raise exceptions.ValidationError("invalid IP range")
-            if r < 1 or r > 32:
-                raise exceptions.ValidationError("invalid IP range")
+        msg = f"invalid IP{' range' if self.range else ''}"
+        value = _strip_newline(value)
+        if not self.range:
+            if not is_ip(value):
+                raise exceptions.ValidationError(msg)
+            return
+        ip, slash, prefix = value.partition("/")
+        if not slash or not prefix or "\n" in prefix or not is_ip(ip):
+            raise exceptions.ValidationError(msg)
+        try:
+            r = int(prefix)
+        except ValueError:
+            raise exceptions.ValidationError("invalid IP range")
+        if r < 1 or r > 32:
+            raise exceptions.ValidationError("invalid IP range")
+
+
+def _chars(*ranges):
+    return frozenset(chr(c) for a, b in ranges for c in range(ord(a), ord(b) + 1))
 
 
 class EmailValidator:
-    # see 2.2.2. Structured Header Field Bodies
-    WSP = r'[\s]'
-    # see 2.2.3. Long Header Fields
-    CRLF = r'(?:\r\n)'
+    """Accept the addr-spec of RFC 2822 3.4.1, with comments and folding white space."""
+
     # see 3.2.1. Primitive Tokens
-    NO_WS_CTL = r'\x01-\x08\x0b\x0c\x0f-\x1f\x7f'
-    # see 3.2.2. Quoted characters
-    QUOTED_PAIR = r'(?:\\.)'
+    NO_WS_CTL = _chars("\x01\x08", "\x0b\x0c", "\x0f\x1f", "\x7f\x7f")
     # see 3.2.3. Folding white space and comments
-    FWS = r'(?:(?:' + WSP + r'*' + CRLF + r')?' + WSP + r'+)'
-    # see 3.2.3
-    CTEXT = r'[' + NO_WS_CTL + r'\x21-\x27\x2a-\x5b\x5d-\x7e]'
-    # see 3.2.3 (NB: The RFC includes COMMENT here
-    CCONTENT = r'(?:' + CTEXT + r'|' + QUOTED_PAIR + r')'
-    # see 3.2.3
-    COMMENT = r'\((?:' + FWS + r'?' + CCONTENT + r')*' + FWS + r'?\)'
-    # see 3.2.3
-    CFWS = r'(?:' + FWS + r'?' + COMMENT + ')*(?:' + FWS + '?' + COMMENT + '|' + FWS + ')'
+    CTEXT = NO_WS_CTL | _chars("\x21\x27", "\x2a\x5b", "\x5d\x7e")
     # see 3.2.4. Atom
-    ATEXT = r'[\w!#$%&\'\*\+\-/=\?\^`\{\|\}~]'
-    ATOM = CFWS + r'?' + ATEXT + r'+' + CFWS + r'?'       # see 3.2.4
-    DOT_ATOM_TEXT = ATEXT + r'+(?:\.' + ATEXT + r'+)*'    # see 3.2.4
-    DOT_ATOM = CFWS + r'?' + DOT_ATOM_TEXT + CFWS + r'?'  # see 3.2.4
+    ATEXT_SPECIALS = frozenset("_!#$%&'*+-/=?^`{|}~")
     # see 3.2.5. Quoted strings
-    QTEXT = r'[' + NO_WS_CTL + r'\x21\x23-\x5b\x5d-\x7e]'
-    QCONTENT = r'(?:' + QTEXT + r'|' + QUOTED_PAIR + r')'  # see 3.2.5
-    QUOTED_STRING = (
-        CFWS + r'?' + r'"(?:' + FWS + r'?' + QCONTENT + r')*' +
-        FWS + r'?' + r'"' + CFWS + r'?'
-    )
+    QTEXT = NO_WS_CTL | _chars("\x21\x21", "\x23\x5b", "\x5d\x7e")
     # see 3.4.1. Addr-spec specification
-    LOCAL_PART = r'(?:' + DOT_ATOM + r'|' + QUOTED_STRING + r')'
-    DTEXT = r'[' + NO_WS_CTL + r'\x21-\x5a\x5e-\x7e]'    # see 3.4.1
-    DCONTENT = r'(?:' + DTEXT + r'|' + QUOTED_PAIR + r')'  # see 3.4.1
-    # see 3.4.1
-    DOMAIN_LITERAL = (
-        CFWS + r'?' + r'\[' + r'(?:' + FWS + r'?' + DCONTENT + r')*' +
-        FWS + r'?\]' + CFWS + r'?'
-    )
-    DOMAIN = r'(?:' + DOT_ATOM + r'|' + DOMAIN_LITERAL + r')'   # see 3.4.1
-    ADDR_SPEC = LOCAL_PART + r'@' + DOMAIN               # see 3.4.1
-    # A valid address will match exactly the 3.4.1 addr-spec.
-    VALID_ADDRESS_REGEXP = '^' + ADDR_SPEC + '$'
+    DTEXT = NO_WS_CTL | _chars("\x21\x5a", "\x5e\x7e")
+
+    # Every scanning method takes the string and the start position and
+    # returns the position after the token, or -1 if the address is invalid.
+
+    def cfws(self, s, i):
+        """Skip (possibly empty) folding white space and comments."""
+        n = len(s)
+        while i < n:
+            if s[i].isspace():
+                i += 1
+            elif s[i] == "(":
+                i = self.quoted(s, i + 1, ")", self.CTEXT)
+                if i < 0:
+                    return -1
+            else:
+                break
+        return i
+
+    def quoted(self, s, i, end, text):
+        """Skip the content of a comment, quoted string or domain literal and its `end`."""
+        n = len(s)
+        while i < n:
+            c = s[i]
+            if c == end:
+                return i + 1
+            if c == "\\":
+                if i + 1 == n or s[i + 1] == "\n":
+                    return -1
+                i += 2
+            elif c in text or c.isspace():
+                i += 1
+            else:
+                return -1
+        return -1
+
+    def atext(self, c):
+        return c.isalnum() or c in self.ATEXT_SPECIALS
+
+    def dot_atom_text(self, s, i):
+        n = len(s)
+        while True:
+            start = i
+            while i < n and self.atext(s[i]):
+                i += 1
+            if i == start:
+                return -1
+            if i == n or s[i] != "." or i + 1 == n or not self.atext(s[i + 1]):
+                return i
+            i += 1
+
+    def token(self, s, i, quote, end, text):
+        """Skip a dot-atom, or a `quote` ... `end` delimited token, with the surrounding CFWS."""
+        i = self.cfws(s, i)
+        if i < 0 or i == len(s):
+            return -1
+        if s[i] == quote:
+            i = self.quoted(s, i + 1, end, text)
+        else:
+            i = self.dot_atom_text(s, i)
+        return -1 if i < 0 else self.cfws(s, i)
+
+    def is_valid(self, address):
+        i = self.token(address, 0, '"', '"', self.QTEXT)
+        if i < 0 or i == len(address) or address[i] != "@":
+            return False
+        return self.token(address, i + 1, "[", "]", self.DTEXT) == len(address)
 
     def __call__(self, value):
         msg = "invalid e-mail address"
-        if not re.match(self.VALID_ADDRESS_REGEXP, value[1]):
+        if not self.is_valid(value[1]):
             raise exceptions.ValidationError(msg)
 
 
+class KeyTypeValidator:
+    """Allow only the given key types (see `keys.KEY_TYPES`) of keys or certificates."""
+
+    def __init__(self, key_types):
+        self.key_types = tuple(key_types)
+
+    def __call__(self, value):
+        from . import keys
+
+        key = value.get_pubkey() if hasattr(value, "get_pubkey") else value
+        if keys.key_type(key) not in self.key_types:
+            raise exceptions.ValidationError(
+                f"key type should be one of {', '.join(self.key_types)}"
+            )
+
+
 class CertificateExpiryValidator:
     def __call__(self, value):
+        from . import cert  # pulls in OpenSSL, only import it when needed
+
         if cert.expiry(value) < datetime.datetime.utcnow():
             raise exceptions.ValidationError("certificate expired")
+
+    def cache_expiry(self, value):
+        from . import cert
+
+        expiry = cert.expiry(value)
+        if expiry < datetime.datetime.utcnow():
+            return None  # expired for good
+        return expiry.replace(tzinfo=datetime.timezone.utc).timestamp()
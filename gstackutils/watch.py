@@ -0,0 +1,166 @@
+"""Wait for changes of storage files, with inotify or by polling."""
+import os
+import pathlib
+import select
+import struct
+import time
+
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+EVENT_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def stat_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class PollingWatcher:
+    """Detect changes by comparing the inode, mtime and size of the paths."""
+
+    def __init__(self, paths, interval=1.0):
+        self.paths = [pathlib.Path(p) for p in paths]
+        self.interval = interval
+        self.keys = {p: stat_key(p) for p in self.paths}
+
+    def poll(self):
+        changed = set()
+        for p in self.paths:
+            key = stat_key(p)
+            if key != self.keys[p]:
+                self.keys[p] = key
+                changed.add(p)
+        return changed
+
+    def wait(self, timeout=None, debounce=0.1):
+        """Return the paths changed, or an empty set after `timeout` seconds.
+
+        Once something changed, wait until the paths are quiet for `debounce`
+        seconds, so a burst of writes is reported once.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed = self.poll()
+        while not changed:
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+            time.sleep(self.interval)
+            changed = self.poll()
+        while True:
+            time.sleep(debounce)
+            more = self.poll()
+            if not more:
+                return changed
+            changed |= more
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InotifyWatcher:
+    """Detect changes with inotify, watching the parent directories.
+
+    Directories are watched (not the files) because storage files are
+    replaced by renaming a new file over them.
+    """
+
+    def __init__(self, paths):
+        import ctypes
+
+        self.paths = [pathlib.Path(p).absolute() for p in paths]
+        # the symbols of the running interpreter include libc's
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        try:
+            for p in self.paths:
+                if p.parent in self.dirs.values():
+                    continue
+                wd = libc.inotify_add_watch(self.fd, os.fsencode(p.parent), EVENT_MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"inotify_add_watch failed on {p.parent}")
+                self.dirs[wd] = p.parent
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def read_events(self, timeout):
+        changed = set()
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        if not r:
+            return changed
+        buf = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(buf):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+            offset += EVENT_HEADER.size
+            name = buf[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, anything could have changed
+                changed |= set(self.paths)
+                continue
+            path = self.dirs.get(wd, pathlib.Path()) / os.fsdecode(name)
+            if path in self.paths:
+                changed.add(path)
+        return changed
+
+    def wait(self, timeout=None, debounce=0.1):
+        """Return the paths changed, or an empty set after `timeout` seconds.
+
+        Once something changed, wait until the paths are quiet for `debounce`
+        seconds, so a burst of writes is reported once.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed = set()
+        while not changed:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return changed
+            changed = self.read_events(remaining)
+        quiet = time.monotonic() + debounce
+        while time.monotonic() < quiet:
+            more = self.read_events(max(0, quiet - time.monotonic()))
+            if more:
+                changed |= more
+                quiet = time.monotonic() + debounce
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def watcher(paths, interval=1.0, poll=False):
+    """Return an `InotifyWatcher`, or a `PollingWatcher` if inotify is not available."""
+    if not poll:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(paths, interval=interval)
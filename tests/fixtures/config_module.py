@@ -71,3 +71,5 @@ class ANOTHER(conf.Section):
     file = fields.FileField(config_file)
     email = fields.EmailField(config_file)
     iplist = fields.IPListField(config_file)
+    ipset = fields.IPSetField(config_file)
+    blob = fields.FileField(config_file, blob=True, max_length=10)
@@ -0,0 +1,10 @@
+from gstackutils import conf, fields
+
+
+journal_file = conf.JournalFile(path=".journal", compact_size=200)
+FILES = [journal_file]
+
+
+class JOURNAL(conf.Section):
+    TOKEN = fields.StringField(journal_file)
+    COUNT = fields.IntegerField(journal_file, default=0)
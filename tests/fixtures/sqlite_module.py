@@ -0,0 +1,11 @@
+from gstackutils import conf, fields
+
+
+sqlite_file = conf.SQLiteFile(path="conf.sqlite")
+FILES = [sqlite_file]
+
+
+class SQLITE(conf.Section):
+    STRING = fields.StringField(sqlite_file)
+    SECRET = fields.StringField(sqlite_file, hide=True)
+    NUMBERS = fields.IntegerListField(sqlite_file, default=[1])
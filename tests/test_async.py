@@ -0,0 +1,48 @@
+import asyncio
+from unittest import mock
+
+from gstackutils import conf, exceptions
+from . import CWDTestCase
+
+
+class TestAsyncConfig(CWDTestCase):
+    cwd = "tests/temp"
+
+    def setUp(self):
+        super().setUp()
+        self.config = conf.AsyncConfig("tests.fixtures.config_module")
+
+    def test_retrieve(self):
+        async def run():
+            await self.config.set_many({"STRING": "hello", "SECRET": "psst"})
+            self.config.config.invalidate()
+            read = mock.patch.object(
+                conf.File, "read", autospec=True, side_effect=conf.File.read
+            )
+            with read as read:
+                values = await asyncio.gather(
+                    *[self.config.retrieve(n) for n in ["STRING", "SECRET", "STRING"]]
+                )
+            self.assertEqual(read.call_count, 1)
+            self.assertEqual(values, ["hello", "psst", "hello"])
+            with self.assertRaises(exceptions.DefaultException):
+                await self.config.retrieve("A")
+        asyncio.run(run())
+
+    def test_set_batched(self):
+        async def run():
+            write = mock.patch.object(
+                conf.File, "write", autospec=True, side_effect=conf.File.write
+            )
+            with write as write:
+                await asyncio.gather(
+                    *[self.config.set("B", i) for i in range(10, 20)],
+                    self.config.set("STRING", "hello"),
+                )
+            self.assertLessEqual(write.call_count, 2)
+            self.assertEqual(await self.config.retrieve("STRING"), "hello")
+            with self.assertRaises(exceptions.ValidationError):
+                await self.config.set("B", 51)
+            info = await self.config.info()
+            self.assertEqual(info, self.config.config.info())
+        asyncio.run(run())
@@ -0,0 +1,18 @@
+import unittest
+
+from benchmarks import suite
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_suite(self):
+        result = suite.run(sections=2, fields=8, files=2, list_items=3, blob_size=10, repeat=1)
+        self.assertEqual(set(result["results"]), {
+            "config_init", "retrieve_one_cold", "retrieve_all_cold", "retrieve_all_warm",
+            "set_one", "set_many_100", "info", "print_info", "cert_generate",
+        })
+        self.assertEqual(suite.compare(result, result), [])
+
+    def test_compare(self):
+        old = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}}}
+        new = {"results": {"a": {"median": 1.1}, "b": {"median": 1.5}, "c": {"median": 9}}}
+        self.assertEqual(suite.compare(old, new, threshold=0.2), [("b", 1.0, 1.5)])
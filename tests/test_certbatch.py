@@ -0,0 +1,105 @@
+import json
+import os
+from unittest import mock
+
+from click.testing import CliRunner
+from OpenSSL import crypto
+
+from gstackutils import cert, certbatch, exceptions, keypool
+from gstackutils.cli import cli
+from . import CWDTestCase
+
+
+MANIFEST = {
+    "ca": {"key": "ca/ca.key", "cert": "ca/ca.crt", "name": "test CA"},
+    "certificates": [
+        {"names": ["db.internal"], "ips": ["10.0.0.5"], "key": "db/tls.key", "cert": "db/tls.crt"},
+        {"names": ["web.internal", "www.internal"]},
+        {"names": ["cache.internal"]},
+    ],
+}
+
+
+def load_cert(path):
+    with open(path, "rb") as f:
+        return crypto.load_certificate(crypto.FILETYPE_PEM, f.read())
+
+
+class TestCertBatch(CWDTestCase):
+    cwd = "tests/temp"
+
+    def setUp(self):
+        super().setUp()
+        self.pool = keypool.KeyPool("pool")
+
+    def write_manifest(self, manifest=MANIFEST, name="manifest.json"):
+        with open(name, "w") as f:
+            json.dump(manifest, f)
+        return name
+
+    def test_issue(self):
+        phases = certbatch.issue(self.write_manifest(), workers=2, keypool=self.pool)
+        self.assertEqual(set(phases), set(certbatch.PHASES))
+        self.assertEqual(phases["sign"]["count"], 3)
+        self.assertEqual(phases["write"]["count"], 3)
+        self.assertEqual(os.stat("ca/ca.key").st_mode & 0o777, 0o600)
+        self.assertEqual(os.stat("db/tls.key").st_mode & 0o777, 0o600)
+
+        store = crypto.X509Store()
+        store.add_cert(load_cert("ca/ca.crt"))
+        for path, name in [("db/tls.crt", "10.0.0.5"), ("web.internal.crt", "www.internal"),
+                           ("cache.internal.crt", "cache.internal")]:
+            crt = load_cert(path)
+            crypto.X509StoreContext(store, crt).verify_certificate()
+            self.assertTrue(cert.valid_for_name(name, crt))
+
+        # the existing CA is reused
+        with open("ca/ca.crt", "rb") as f:
+            ca = f.read()
+        certbatch.issue("manifest.json", workers=1, keypool=self.pool)
+        with open("ca/ca.crt", "rb") as f:
+            self.assertEqual(f.read(), ca)
+        crypto.X509StoreContext(store, load_cert("db/tls.crt")).verify_certificate()
+
+    def test_yaml(self):
+        with open("manifest.yaml", "w") as f:
+            f.write("certificates:\n  - names: [a.internal]\n")
+        certbatch.issue("manifest.yaml", workers=1, keypool=self.pool)
+        self.assertTrue(cert.valid_for_name("a.internal", load_cert("a.internal.crt")))
+        self.assertEqual(load_cert("ca.crt").get_subject().CN, "a.internal CA")
+
+    def test_invalid(self):
+        for manifest in [{}, {"certificates": []}, {"certificates": [{"ips": ["1.2.3.4"]}]},
+                         {"certificates": [{"names": ["a"]}, {"names": ["a"]}]}]:
+            with self.assertRaises(exceptions.InvalidUsage):
+                certbatch.issue(self.write_manifest(manifest), workers=1, keypool=self.pool)
+        with self.assertRaises(exceptions.InvalidUsage):
+            certbatch.issue(self.write_manifest(
+                {"certificates": [{"names": ["a"], "ips": ["not-an-ip"]}]}
+            ), workers=1, keypool=self.pool)
+        # a new CA is written only with the certificates
+        with mock.patch.object(cert, "sign_leaf", side_effect=ValueError("failed")):
+            with self.assertRaises(ValueError):
+                certbatch.issue(self.write_manifest(), workers=1, keypool=self.pool)
+        self.assertFalse(os.path.exists("ca"))
+        self.assertFalse(os.path.exists("ca.key"))
+        self.write_manifest({"ca": {"key": "other.key"}, "certificates": [{"names": ["b"]}]})
+        certbatch.issue("manifest.json", workers=1, keypool=self.pool)
+        os.unlink("b.crt")
+        os.unlink("other.key")
+        with self.assertRaises(exceptions.InvalidUsage):
+            certbatch.issue("manifest.json", workers=1, keypool=self.pool)
+        with open("other.key", "wb") as f:
+            f.write(crypto.dump_privatekey(crypto.FILETYPE_PEM, cert.new_key(self.pool)))
+        with self.assertRaises(exceptions.InvalidUsage):
+            certbatch.issue("manifest.json", workers=1, keypool=self.pool)
+        self.assertFalse(os.path.exists("b.crt"))
+
+    def test_cli(self):
+        with mock.patch.dict(os.environ, {"GSTACK_KEYPOOL": "pool"}):
+            result = CliRunner().invoke(cli, ["cert", "batch", self.write_manifest(), "-j", "2"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("3 certificates issued", result.output)
+        self.assertIn("sign", result.output)
+        self.write_manifest({"certificates": []})
+        self.assertEqual(CliRunner().invoke(cli, ["cert", "batch", "manifest.json"]).exit_code, 2)
@@ -0,0 +1,15 @@
+import unittest
+
+from benchmarks import stress
+
+
+class TestConcurrency(unittest.TestCase):
+    def test_no_lost_writes(self):
+        result = stress.run(processes=4, iterations=25)
+        self.assertEqual(result["read_errors"], 0)
+        self.assertEqual(result["lost_writes"], [])
+
+    def test_no_lost_writes_single_file_mount(self):
+        result = stress.run(processes=4, iterations=25, single_file_mount=True)
+        self.assertEqual(result["read_errors"], 0)
+        self.assertEqual(result["lost_writes"], [])
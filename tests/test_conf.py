@@ -1,7 +1,15 @@
 import unittest
+import errno
+import hashlib
 import importlib
+import io
+import os
+import pathlib
+import subprocess
+import sys
+from unittest import mock
 
-from gstackutils import conf
+from gstackutils import conf, exceptions
 from . import CWDTestCase
 
 
@@ -18,3 +26,212 @@ class TestConf(CWDTestCase):
         c = conf.Config("tests.fixtures.config_module")
         c.set("STRING", "hello")
         self.assertEqual(c.retrieve("STRING"), "hello")
+
+    def test_retrieve_uses_snapshot(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("STRING", "hello")
+        c.set("B", 12)
+        read = mock.patch.object(
+            conf.File, "read", autospec=True, side_effect=conf.File.read
+        )
+        with read as read:
+            self.assertEqual(c.retrieve("STRING"), "hello")
+            self.assertEqual(c.retrieve("B"), 12)
+            c.info()
+        self.assertEqual(read.call_count, 1)
+
+    def test_snapshot_invalidated_on_change(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("STRING", "hello")
+        self.assertEqual(c.retrieve("STRING"), "hello")
+        with open(".conf", "a") as f:
+            f.write("B=13\n")
+        self.assertEqual(c.retrieve("B"), 13)
+        c.set("STRING", "world")
+        self.assertEqual(c.retrieve("STRING"), "world")
+
+    def test_set_many(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("STRING", "hello")
+        os.chmod(".conf", 0o600)
+        with mock.patch("os.replace", wraps=os.replace) as replace:
+            c.set_many({"STRING": "world", "B": 12, "SECRET": "psst"})
+        self.assertEqual(replace.call_count, 1)
+        self.assertEqual(c.retrieve("STRING"), "world")
+        self.assertEqual(c.retrieve("B"), 12)
+        self.assertEqual(c.retrieve("SECRET"), "psst")
+        self.assertEqual(os.stat(".conf").st_mode & 0o777, 0o600)
+        self.assertEqual(sorted(os.listdir(".")), [".conf", ".conf.lock"])
+
+    def test_rewrite_in_place(self):
+        # a file bind-mounted on its own can not be renamed over
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("STRING", "hello")
+        os.chmod(".conf", 0o640)
+        ino = os.stat(".conf").st_ino
+        busy = OSError(errno.EBUSY, "Device or resource busy")
+        with mock.patch("os.replace", side_effect=busy):
+            c.set_many({"STRING": "hi", "B": 12})
+        self.assertEqual(c.retrieve("STRING"), "hi")
+        self.assertEqual(c.retrieve("B"), 12)
+        self.assertEqual(os.stat(".conf").st_ino, ino)
+        self.assertEqual(os.stat(".conf").st_mode & 0o777, 0o640)
+        self.assertEqual(sorted(os.listdir(".")), [".conf", ".conf.lock"])
+        with mock.patch.object(conf.File, "mounted", return_value=True):
+            with mock.patch("os.replace") as replace:
+                c.set("STRING", "mounted")
+        replace.assert_not_called()
+        self.assertEqual(c.retrieve("STRING"), "mounted")
+
+    def test_blob_permissions(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("STRING", "hello")
+        os.chmod(".conf", 0o640)
+        c.set_file("blob", io.BytesIO(b"data"))
+        digest = hashlib.sha256(b"data").hexdigest()
+        self.assertEqual(os.stat(f".conf.blobs/{digest}").st_mode & 0o777, 0o640)
+        self.assertEqual(os.stat(".conf.blobs").st_mode & 0o777, 0o750)
+
+        # an unreadable blob makes the config illegal, as a missing one
+        builtin_open = open
+
+        def denied(path, *args, **kwargs):
+            if ".blobs" in str(path):
+                raise PermissionError(errno.EACCES, "Permission denied", path)
+            return builtin_open(path, *args, **kwargs)
+
+        with mock.patch("builtins.open", side_effect=denied):
+            with self.assertRaisesRegex(ValueError, "Unreadable blob"):
+                c.retrieve("blob")
+            info = c.field_info("blob")
+        self.assertEqual(info["status"], "ILLEGAL")
+
+    def test_set_many_validates_first(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("STRING", "hello")
+        with self.assertRaises(exceptions.ValidationError):
+            c.set_many({"STRING": "world", "B": 51})
+        self.assertEqual(c.retrieve("STRING"), "hello")
+
+    def test_transaction(self):
+        c = conf.Config("tests.fixtures.config_module")
+        with c.transaction():
+            c.set("STRING", "hello")
+            c.set("B", 12)
+            self.assertFalse(os.path.exists(".conf"))
+        self.assertEqual(c.retrieve("STRING"), "hello")
+        self.assertEqual(c.retrieve("B"), 12)
+
+        with self.assertRaises(RuntimeError):
+            with c.transaction():
+                c.set("STRING", "world")
+                raise RuntimeError()
+        self.assertEqual(c.retrieve("STRING"), "hello")
+
+        with c.transaction():
+            c.set("B", None)
+        with self.assertRaises(exceptions.DefaultException):
+            c.retrieve("B")
+
+    def test_provide(self):
+        # the fixture services belong to root, only root can chown to them
+        for attr, owner in [("uid", os.getuid()), ("gid", os.getgid())]:
+            patcher = mock.patch.object(conf.Service, attr, property(lambda self, o=owner: o))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        c = conf.Config("tests.fixtures.config_module", secrets_dir="secrets")
+        c.set("HOST_NAMES", ["a.com", "b.com", "c.com"])
+        written = c.provide()
+        self.assertEqual(sorted(map(str, written)), [
+            "secrets/django/C", "secrets/django/HOST_NAMES",
+            "secrets/nginx/C", "secrets/nginx/HOST_NAMES",
+        ])
+        with open("secrets/nginx/HOST_NAMES") as f:
+            self.assertEqual(f.read(), "a.com,b.com,c.com")
+        with open("secrets/nginx/C") as f:
+            self.assertEqual(f.read(), "gstack.localhost")
+        st = os.stat("secrets/nginx/C")
+        self.assertEqual(st.st_mode & 0o777, 0o400)
+        self.assertEqual((st.st_uid, st.st_gid), (os.getuid(), os.getgid()))
+
+        self.assertEqual(c.provide(), [])
+        c.set("HOST_NAMES", ["a.com", "b.com", "d.com"])
+        self.assertEqual(c.provide("django"), [pathlib.Path("secrets/django/HOST_NAMES")])
+        self.assertEqual(c.provide("nginx", name="C"), [])
+
+    def test_use(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("HOST_NAMES", ["a.com", "b.com", "c.com"])
+        self.assertEqual(
+            c.use("other"), {"HOST_NAMES": "a.com,b.com,c.com", "C": "gstack.localhost"}
+        )
+        self.assertEqual(c.use("other", name="C"), {"C": "gstack.localhost"})
+        self.assertEqual(c.use("django"), {})
+
+    def test_exec(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("HOST_NAMES", ["a.com", "b.com", "c.com"])
+        out = subprocess.run(
+            [
+                sys.executable, "-c", "from gstackutils.cli import cli; cli()",
+                "conf", "-c", "tests.fixtures.config_module",
+                "exec", "other", "--", "sh", "-c", "echo $HOST_NAMES $C"
+            ],
+            env={**os.environ, "PYTHONPATH": self._orig_cwd},
+            stdout=subprocess.PIPE, check=True,
+        ).stdout
+        self.assertEqual(out, b"a.com,b.com,c.com gstack.localhost\n")
+
+    def test_remove_stale(self):
+        with open(".conf", "w") as f:
+            f.write("# comment\nOLD=1\nSTRING=hello\nOLDER=2\nOLD=3\n")
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("B", 12)
+        removed = c.remove_stale(dry_run=True)
+        self.assertEqual(removed, {c.files[0]: ["OLD", "OLDER"]})
+        self.assertEqual(c.remove_stale(), removed)
+        with open(".conf") as f:
+            self.assertEqual(f.read(), "# comment\nSTRING=hello\nB=12\n")
+        self.assertEqual(c.remove_stale(), {})
+
+    def test_parallel_info(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set_many({"STRING": "hello", "B": 51, "HOST_NAMES": ["a.com"]}, validate=False)
+        info = c.info()
+        self.assertEqual(c.info(workers=4), info)
+        self.assertEqual(
+            [(i["field"], i["status"]) for i in info[0]["config_items"]],
+            [("STRING", "OK"), ("SECRET", "NOT SET"), ("HOST_NAMES", "INVALID")]
+        )
+
+    def test_blob(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set_file("blob", io.BytesIO(b"\x00binary"))
+        digest = hashlib.sha256(b"\x00binary").hexdigest()
+        with open(".conf") as f:
+            self.assertEqual(f.read(), f"blob=@sha256:{digest}\n")
+        self.assertEqual(os.listdir(".conf.blobs"), [digest])
+        self.assertEqual(c.retrieve("blob"), b"\x00binary")
+        out = io.BytesIO()
+        c.retrieve_file("blob", out)
+        self.assertEqual(out.getvalue(), b"\x00binary")
+
+        with self.assertRaises(exceptions.ValidationError):
+            c.set_file("blob", io.BytesIO(b"too long value"))
+        self.assertEqual(os.listdir(".conf.blobs"), [digest])
+
+        c.set("blob", b"other")
+        self.assertEqual(c.retrieve("blob"), b"other")
+        self.assertEqual(len(os.listdir(".conf.blobs")), 2)
+        self.assertEqual(c.compact(), [])  # the old blob is too recent
+        os.utime(f".conf.blobs/{digest}", (0, 0))
+        self.assertEqual(c.compact(), c.files)
+        self.assertEqual(os.listdir(".conf.blobs"), [hashlib.sha256(b"other").hexdigest()])
+
+        # only blob fields refer to blobs, and only by their digest
+        c.set("STRING", "@sha256:0123abcd")
+        self.assertEqual(c.retrieve("STRING"), "@sha256:0123abcd")
+        _, field = c.get_field("blob")
+        c.write_changes({field.file: {"blob": "@sha256:../../.conf"}})
+        with self.assertRaises(ValueError):
+            c.retrieve("blob")
@@ -0,0 +1,33 @@
+import unittest
+from unittest import mock
+
+from gstackutils import conf, fields
+
+
+class TestDecodeCache(unittest.TestCase):
+    def setUp(self):
+        self.file = conf.File(".conf")
+        fields.Field.decode_cache.clear()
+
+    def test_cached(self):
+        field = fields.StringListField(self.file)
+        with mock.patch.object(field, "from_stream", wraps=field.from_stream) as from_stream:
+            value = field.from_storage("a,b")
+            value.append("c")
+            self.assertEqual(field.from_storage("a,b"), ["a", "b"])
+            self.assertEqual(field.from_storage("c"), ["c"])
+        self.assertEqual(from_stream.call_count, 2)
+        self.assertEqual(
+            fields.Field.decode_cache.info(),
+            {"hits": 1, "misses": 2, "size": 2, "maxsize": 256}
+        )
+
+    def test_bounded(self):
+        cache = fields.DecodeCache(maxsize=2, max_length=3)
+        field = fields.StringField(self.file)
+        for s in ["a", "b", "a", "c", "long"]:
+            cache.put(field, s, s)
+        self.assertEqual(cache.get(field, "b"), (False, None))
+        self.assertEqual(cache.get(field, "a"), (True, "a"))
+        self.assertEqual(cache.get(field, "long"), (False, None))
+        self.assertEqual(cache.info()["size"], 2)
@@ -0,0 +1,114 @@
+import random
+import ssl
+import unittest
+import warnings
+
+from gstackutils import cert, conf, fields
+from gstackutils.hostindex import HostIndex
+from benchmarks import hostnames as bench
+
+
+PATTERNS = [
+    "example.com", "*.example.com", "*.Sub.Example.COM", "*.", "a..b", "trailing.dot.",
+    "w*.partial.com", "*.*.double.com", "*", "x.*.inner.com", "*.co", "1.2.3.4",
+    "Bücher.de", "*.bücher.de",
+]
+NAMES = [
+    "", ".", "example.com", "EXAMPLE.com", "www.example.com", "a.b.example.com", ".example.com",
+    "x.sub.example.com", "sub.example.com", "a.", "a..b", "trailing.dot", "trailing.dot.",
+    "www.partial.com", "a.b.double.com", "anything", "x.y.inner.com", "co", "a.co", "1.2.3.4",
+    "01.2.3.4", "bücher.de", "BÜCHER.de", "x.bücher.de", "example.com.",
+]
+
+
+def reference_covered(patterns, ips, name):
+    san = [("DNS", p) for p in patterns] + [("IP Address", i) for i in ips]
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            ssl.match_hostname({"subjectAltName": san}, name)
+    except ssl.CertificateError:
+        return False
+    return True
+
+
+def index(patterns, ips):
+    index = HostIndex()
+    for p in patterns:
+        index.add_name(p)
+    for i in ips:
+        index.add_ip(i)
+    return index
+
+
+class TestHostIndex(unittest.TestCase):
+    def test_match(self):
+        i = HostIndex(["example.com", "*.example.com", "10.0.0.1", "::1"])
+        self.assertEqual(i.match("WWW.example.com"), "*.example.com")
+        self.assertEqual(i.match("example.com"), "example.com")
+        self.assertIsNone(i.match("a.b.example.com"))
+        self.assertIn("10.0.0.1", i)
+        self.assertIn("0::1", i)
+        self.assertNotIn("10.0.0.2", i)
+        self.assertEqual(i.covered(["x.example.com", "y.org", "::1"]), ["x.example.com", "::1"])
+
+    def test_dns_names_do_not_match_ips(self):
+        self.assertNotIn("1.2.3.4", index(["1.2.3.4"], []))
+        self.assertIn("1.2.3.4", HostIndex(["1.2.3.4"]))
+
+    @unittest.skipUnless(hasattr(ssl, "match_hostname"), "ssl.match_hostname is gone")
+    def test_same_as_match_hostname(self):
+        # every pattern alone, so the malformed ones can not mask the others
+        for pattern in PATTERNS:
+            i = index([pattern], [])
+            for name in NAMES:
+                with self.subTest(pattern=pattern, name=name):
+                    self.assertEqual(name in i, reference_covered([pattern], [], name))
+
+    @unittest.skipUnless(hasattr(ssl, "match_hostname"), "ssl.match_hostname is gone")
+    def test_same_as_match_hostname_random(self):
+        dns_names, ips, names = bench.workload(50, 1000)
+        rnd = random.Random(0)
+        names += ["".join(rnd.choice("ab.*") for _ in range(rnd.randint(0, 6))) for _ in range(500)]
+        i = index(dns_names, ips)
+        for name in names:
+            with self.subTest(name=name):
+                self.assertEqual(name in i, reference_covered(dns_names, ips, name))
+
+
+class TestCert(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            cls.cert = bench.make_cert(["example.com", "*.example.org"], ["10.0.0.1"])
+
+    def test_valid_for_name(self):
+        self.assertTrue(cert.valid_for_name("example.com", self.cert))
+        self.assertTrue(cert.valid_for_name("www.example.org", self.cert))
+        self.assertTrue(cert.valid_for_name("10.0.0.1", self.cert))
+        self.assertFalse(cert.valid_for_name("www.example.com", self.cert))
+        self.assertFalse(cert.valid_for_name("example.org", self.cert))
+
+    def test_covered_names(self):
+        names = ["a.example.org", "example.com", "b.example.com", "10.0.0.1", "10.0.0.2"]
+        self.assertEqual(
+            cert.covered_names(names, self.cert), ["a.example.org", "example.com", "10.0.0.1"]
+        )
+        self.assertIs(cert.name_index(self.cert), cert.name_index(self.cert))
+
+    def test_field_index(self):
+        field = fields.HostNameListField(conf.File(".conf"))
+        value = field.from_storage("example.com,gstack.localhost")
+        self.assertEqual(
+            field.index(value).covered(["GSTACK.localhost", "x.example.com"]), ["GSTACK.localhost"]
+        )
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            results = bench.run(sans=10, names=50, repeat=1)
+        self.assertIn("bulk", results)
+        self.assertIn("per_name", results)
@@ -0,0 +1,54 @@
+import json
+
+from click.testing import CliRunner
+
+from gstackutils import conf, instrument
+from gstackutils.cli import cli
+from . import CWDTestCase
+
+
+class TestInstrument(CWDTestCase):
+    cwd = "tests/temp"
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+        super().tearDown()
+
+    def test_counters(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("B", 12)
+        calls = []
+
+        def callback(phase, seconds):
+            calls.append(phase)
+
+        instrument.enable()
+        instrument.add_callback(callback)
+        try:
+            c.invalidate()
+            c.retrieve("B")
+        finally:
+            instrument.remove_callback(callback)
+        counters = instrument.counters()
+        self.assertEqual(counters["storage.read"]["count"], 1)
+        self.assertEqual(counters["field.from_storage"]["count"], 1)
+        self.assertEqual(calls, [
+            "storage.read", "field.from_storage", "validator.not_5", "validator.MaxValueValidator"
+        ])
+
+    def test_cli_profile(self):
+        conf.Config("tests.fixtures.config_module").set("B", 12)
+        result = CliRunner().invoke(cli, [
+            "--profile", "--profile-json", "profile.json", "--profile-dump", "profile.prof",
+            "conf", "-c", "tests.fixtures.config_module", "info",
+        ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("termout.print_info", result.output)
+        with open("profile.json") as f:
+            counters = json.load(f)
+        for phase in [
+            "import", "total", "storage.read", "field.from_storage",
+            "validator.MaxValueValidator", "validator.not_5", "termout.print_info"
+        ]:
+            self.assertIn(phase, counters)
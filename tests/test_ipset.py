@@ -0,0 +1,95 @@
+import ipaddress
+import os
+import random
+import unittest
+
+from click.testing import CliRunner
+
+from gstackutils import conf, fields
+from gstackutils.cli import cli
+from gstackutils.ipset import IPSet
+from . import CWDTestCase
+
+
+class TestIPSet(unittest.TestCase):
+    def test_merge(self):
+        s = IPSet([
+            "10.0.0.0/8", "10.1.0.0/16", "192.168.1.1", "192.168.1.2", "192.168.1.2",
+            "172.16.0.5-172.16.0.20", "172.16.0.10-172.16.0.30", "::1", "2001:db8::/32",
+        ])
+        self.assertEqual(
+            str(s), "10.0.0.0/8,172.16.0.5-172.16.0.30,192.168.1.1-192.168.1.2,::1,2001:db8::/32"
+        )
+        self.assertEqual(len(s), 5)
+        self.assertEqual(IPSet(str(s)), s)
+        self.assertEqual(IPSet(["10.0.0.0/25", "10.0.0.128/25"]), IPSet("10.0.0.0/24"))
+        self.assertEqual(IPSet("10.0.0.1/24").num_addresses(), 256)
+        self.assertEqual(
+            list(IPSet("10.0.0.1-10.0.0.2").networks()),
+            [ipaddress.ip_network("10.0.0.1/32"), ipaddress.ip_network("10.0.0.2/32")]
+        )
+
+    def test_contains(self):
+        s = IPSet("10.0.0.0/8,192.168.1.1-192.168.1.9,::1")
+        for address in ["10.0.0.0", "10.255.255.255", "192.168.1.1", "192.168.1.9", "::1"]:
+            self.assertIn(address, s)
+            self.assertIn(ipaddress.ip_address(address), s)
+        for address in ["9.255.255.255", "11.0.0.0", "192.168.1.10", "::2", "0.0.0.0", "nonsense"]:
+            self.assertNotIn(address, s)
+        self.assertNotIn("1.2.3.4", IPSet())
+        self.assertFalse(IPSet(""))
+
+    def test_contains_random(self):
+        rnd = random.Random(0)
+        networks = [
+            ipaddress.ip_network((rnd.getrandbits(32), rnd.randint(8, 32)), strict=False)
+            for _ in range(500)
+        ]
+        s = IPSet(networks)
+        for _ in range(2000):
+            address = ipaddress.IPv4Address(rnd.getrandbits(32))
+            self.assertEqual(address in s, any(address in n for n in networks))
+        for n in networks:
+            self.assertIn(n.network_address, s)
+            self.assertIn(n.broadcast_address, s)
+
+    def test_invalid(self):
+        for entry in ["1.2.3", "1.2.3.4/33", "10.0.0.9-10.0.0.1", "10.0.0.1-::1", "a-b"]:
+            with self.assertRaises(ValueError):
+                IPSet(entry)
+
+
+class TestIPSetField(CWDTestCase):
+    cwd = "tests/temp"
+
+    def test_storage(self):
+        field = fields.IPSetField(conf.File(".conf"))
+        self.assertEqual(
+            field.to_storage(["10.0.0.2", "10.0.0.0/31", "10.0.0.3"]), "10.0.0.0/30"
+        )
+        value = field.from_storage("10.0.0.0/30,::1")
+        self.assertIsInstance(value, IPSet)
+        self.assertIn("10.0.0.3", value)
+        self.assertEqual(field.to_storage(value), "10.0.0.0/30,::1")
+        with self.assertRaises(ValueError):
+            field.from_storage("10.0.0.0/33")
+
+    def test_config(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("ipset", ["192.168.0.0/24", "192.168.1.0/24", "192.168.0.7"])
+        with open(".conf") as f:
+            self.assertIn("ipset=192.168.0.0/23\n", f.read())
+        self.assertIn("192.168.1.200", c.retrieve("ipset"))
+        c.set("ipset", "10.0.0.1,10.0.0.2", from_stream=True)
+        self.assertEqual(str(c.retrieve("ipset")), "10.0.0.1-10.0.0.2")
+
+    def test_invalid_input(self):
+        c = conf.Config("tests.fixtures.config_module")
+        with self.assertRaises(ValueError):
+            c.set("ipset", "10.0.0.1,bogus", from_stream=True)
+        result = CliRunner().invoke(
+            cli, ["conf", "-c", "tests.fixtures.config_module", "set", "ipset", "-v", "bogus"]
+        )
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertIn("Invalid value for ipset", result.output)
+        self.assertFalse(os.path.exists(".conf"))
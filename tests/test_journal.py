@@ -0,0 +1,74 @@
+import errno
+import os
+from unittest import mock
+
+from gstackutils import conf, exceptions
+from . import CWDTestCase
+
+
+class TestJournal(CWDTestCase):
+    cwd = "tests/temp"
+
+    def read(self):
+        with open(".journal") as f:
+            return f.read()
+
+    def test_append(self):
+        c = conf.Config("tests.fixtures.journal_module")
+        c.set("TOKEN", "a")
+        c.set("TOKEN", "b")
+        c.set_many({"COUNT": 1, "TOKEN": None})
+        self.assertEqual(self.read(), "TOKEN=a\nTOKEN=b\nCOUNT=1\n-TOKEN\n")
+        self.assertEqual(c.retrieve("COUNT"), 1)
+        with self.assertRaises(exceptions.ConfigNotSetError):
+            c.retrieve("TOKEN")
+        c.set("TOKEN", "c")
+        self.assertEqual(c.retrieve("TOKEN"), "c")
+
+    def test_plain_format(self):
+        with open(".journal", "w") as f:
+            f.write("# tokens\nTOKEN=a\nCOUNT=3")
+        c = conf.Config("tests.fixtures.journal_module")
+        self.assertEqual(c.retrieve("TOKEN"), "a")
+        c.set("TOKEN", "b")
+        self.assertEqual(c.retrieve("TOKEN"), "b")
+        self.assertEqual(c.retrieve("COUNT"), 3)
+        self.assertEqual(self.read(), "# tokens\nTOKEN=a\nCOUNT=3\nTOKEN=b\n")
+
+    def test_read_only(self):
+        with open(".journal", "w") as f:
+            f.write("TOKEN=a\n")
+        os_open = os.open
+
+        def read_only_open(path, flags, *args):
+            if flags & (os.O_CREAT | os.O_WRONLY | os.O_RDWR):
+                raise OSError(errno.EROFS, "Read-only file system", path)
+            return os_open(path, flags, *args)
+
+        with mock.patch("os.open", side_effect=read_only_open):
+            self.assertEqual(conf.Config("tests.fixtures.journal_module").retrieve("TOKEN"), "a")
+        self.assertFalse(os.path.exists(".journal.lock"))
+
+    def test_compact(self):
+        c = conf.Config("tests.fixtures.journal_module")
+        c.set("TOKEN", "a")
+        c.set("TOKEN", "b")
+        c.set("COUNT", 2)
+        self.assertEqual(c.compact(), c.files)
+        self.assertEqual(self.read(), "TOKEN=b\nCOUNT=2\n")
+        self.assertEqual(c.compact(), [])
+        self.assertEqual(c.retrieve("TOKEN"), "b")
+
+    def test_auto_compact(self):
+        c = conf.Config("tests.fixtures.journal_module")
+        for i in range(100):
+            c.set("COUNT", i)
+            self.assertEqual(c.retrieve("COUNT"), i)
+        self.assertLess(len(self.read()), 200)
+
+    def test_remove_stale(self):
+        with open(".journal", "w") as f:
+            f.write("OLD=1\nTOKEN=a\nOLD=2\nGONE=1\n-GONE\n")
+        c = conf.Config("tests.fixtures.journal_module")
+        self.assertEqual(c.remove_stale(), {c.files[0]: ["OLD"]})
+        self.assertEqual(self.read(), "TOKEN=a\n")
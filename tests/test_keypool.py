@@ -0,0 +1,72 @@
+import os
+from unittest import mock
+
+from click.testing import CliRunner
+from OpenSSL import crypto
+
+from gstackutils import cert, exceptions, keypool
+from gstackutils.cli import cli
+from . import CWDTestCase
+
+
+class TestKeyPool(CWDTestCase):
+    cwd = "tests/temp"
+
+    def test_fill_and_take(self):
+        pool = keypool.KeyPool("pool", key_size=1024)
+        self.assertIsNone(pool.take())
+        self.assertEqual(pool.fill(3, workers=2), 3)
+        self.assertEqual(pool.fill(2), 0)
+        self.assertEqual(len(pool), 3)
+        self.assertEqual(os.stat(pool.path).st_mode & 0o777, 0o700)
+        for path in pool.keys():
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+        key = pool.take()
+        self.assertEqual(key.bits(), 1024)
+        self.assertEqual(len(pool), 2)
+        self.assertEqual(sorted(os.listdir(pool.path)), [p.name for p in pool.keys()])
+
+    def test_unprotected_pool_ignored(self):
+        pool = keypool.KeyPool("pool")
+        pool.fill(1, workers=1)
+        os.chmod(pool.path, 0o755)
+        self.assertIsNone(pool.take())
+        with self.assertRaises(exceptions.InvalidUsage):
+            pool.fill(2, workers=1)
+        self.assertEqual(len(os.listdir(pool.path)), 1)
+        for command in ["status"], ["fill", "2"]:
+            result = CliRunner().invoke(cli, ["cert", "keypool", "-d", "pool"] + command)
+            self.assertEqual(result.exit_code, 1, result.output)
+
+    def test_generate_uses_pool(self):
+        pool = keypool.KeyPool("pool")
+        pool.fill(2, workers=2)
+        with mock.patch.object(crypto.PKey, "generate_key") as generate_key:
+            cert.generate(["example.com"], keypool=pool)
+        generate_key.assert_not_called()
+        self.assertEqual(len(pool), 0)
+        with open("example.com.key", "rb") as f:
+            self.assertEqual(crypto.load_privatekey(crypto.FILETYPE_PEM, f.read()).bits(), 2048)
+
+    def test_generate_falls_back(self):
+        pool = keypool.KeyPool("pool")
+        pool.fill(1, workers=1)
+        original = crypto.PKey.generate_key
+        with mock.patch.object(
+            crypto.PKey, "generate_key", autospec=True, side_effect=original
+        ) as generate_key:
+            cert.generate(["example.com"], keypool=pool)
+        self.assertEqual(generate_key.call_count, 1)
+
+    def test_cli(self):
+        with mock.patch.dict(os.environ, {"GSTACK_KEYPOOL": "pool"}):
+            result = CliRunner().invoke(cli, ["cert", "keypool", "fill", "2", "-j", "2"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("2 keys generated", result.output)
+            result = CliRunner().invoke(cli, ["cert", "keypool", "status"])
+            self.assertIn("2 keys in pool/rsa-2048", result.output)
+            result = CliRunner().invoke(cli, ["cert", "-n", "example.com"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(len(keypool.KeyPool()), 0)
+        self.assertTrue(os.path.exists("example.com.crt"))
+        self.assertEqual(CliRunner().invoke(cli, ["cert"]).exit_code, 2)
@@ -0,0 +1,119 @@
+import os
+from unittest import mock
+
+from click.testing import CliRunner
+from OpenSSL import crypto
+
+from gstackutils import cert, conf, exceptions, fields, keypool, keys
+from gstackutils.cli import cli
+from benchmarks import keytypes
+from . import CWDTestCase
+
+
+def load(path, loader):
+    with open(path, "rb") as f:
+        return loader(crypto.FILETYPE_PEM, f.read())
+
+
+class TestKeys(CWDTestCase):
+    cwd = "tests/temp"
+
+    def setUp(self):
+        super().setUp()
+        self.pool = keypool.KeyPool("pool")
+
+    def test_generate(self):
+        for key_type, description in [
+            ("ec-p256", "EC, curve secp256r1"),
+            ("ec-p384", "EC, curve secp384r1"),
+            ("ed25519", "Ed25519"),
+        ]:
+            key = keys.generate(key_type)
+            self.assertEqual(keys.key_type(key), key_type)
+            self.assertEqual(keys.describe(key), description)
+        key = keys.generate("rsa", 1024)
+        self.assertEqual(keys.key_type(key), "rsa")
+        self.assertEqual(keys.describe(key), "RSA, 1024 bits")
+
+    def test_key_size(self):
+        self.assertEqual(keys.key_size(), 2048)
+        self.assertEqual(keys.key_size("rsa", 4096), 4096)
+        self.assertIsNone(keys.key_size("ed25519"))
+        for key_type, size in [("dsa", None), ("ec-p256", 256), ("rsa", 512)]:
+            with self.assertRaises(exceptions.InvalidUsage):
+                keys.key_size(key_type, size)
+
+    def test_generate_cert(self):
+        for key_type in keys.KEY_TYPES:
+            with self.subTest(key_type=key_type):
+                cert.generate(["example.com"], ["10.0.0.1"], keypool=self.pool, key_type=key_type)
+                key = load("example.com.key", crypto.load_privatekey)
+                crt = load("example.com.crt", crypto.load_certificate)
+                cacert = load("example.com_CA.crt", crypto.load_certificate)
+                self.assertEqual(keys.key_type(key), key_type)
+                self.assertEqual(keys.key_type(crt.get_pubkey()), key_type)
+                self.assertTrue(cert.consistent(key, crt))
+                cakey = load("example.com_CA.key", crypto.load_privatekey)
+                self.assertTrue(cert.consistent(cakey, cacert))
+                self.assertFalse(cert.consistent(key, cacert))
+                store = crypto.X509Store()
+                store.add_cert(cacert)
+                crypto.X509StoreContext(store, crt).verify_certificate()
+                self.assertEqual(
+                    cert.covered_names(["example.com", "10.0.0.1", "x.com"], crt),
+                    ["example.com", "10.0.0.1"]
+                )
+
+    def test_existing_ca(self):
+        cert.generate(["ca.example.com"], keypool=self.pool, key_type="ed25519")
+        with open("ca.example.com_CA.key", "rb") as cakey:
+            with open("ca.example.com_CA.crt", "rb") as cacert:
+                cert.generate(
+                    ["leaf.example.com"], cakeyfile=cakey, cacertfile=cacert,
+                    keypool=self.pool, key_type="ec-p384"
+                )
+        crt = load("leaf.example.com.crt", crypto.load_certificate)
+        self.assertEqual(keys.key_type(crt.get_pubkey()), "ec-p384")
+        store = crypto.X509Store()
+        store.add_cert(load("ca.example.com_CA.crt", crypto.load_certificate))
+        crypto.X509StoreContext(store, crt).verify_certificate()
+
+    def test_fields(self):
+        cert.generate(["example.com"], keypool=self.pool, key_type="ec-p256")
+        file = conf.File(".conf")
+        key_field = fields.SSLPrivateKeyField(file, key_types=["ec-p256"])
+        self.assertTrue(key_field.hide)
+        with self.assertRaises(exceptions.InvalidUsage):
+            fields.SSLPrivateKeyField(file, hide=False)
+        with open("example.com.key", "rb") as f:
+            key = key_field.from_stream(f.read())
+        key_field.validate(key)
+        self.assertEqual(key_field.human_readable(key), "SSL private key, EC, curve secp256r1")
+        self.assertEqual(key_field.reportable(key), "*****")
+        stored = key_field.from_storage(key_field.to_storage(key))
+        self.assertTrue(cert.consistent(stored, load("example.com.crt", crypto.load_certificate)))
+
+        cert_field = fields.SSLCertificateField(file, key_types=["ed25519"])
+        with open("example.com.crt", "rb") as f:
+            crt = cert_field.from_stream(f.read())
+        self.assertIn("EC, curve secp256r1 key", cert_field.human_readable(crt))
+        with self.assertRaises(exceptions.ValidationError):
+            cert_field.validate(crt)
+
+    def test_cli(self):
+        with mock.patch.dict(os.environ, {"GSTACK_KEYPOOL": "pool"}):
+            result = CliRunner().invoke(cli, ["cert", "-n", "example.com", "-t", "ed25519"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            key = load("example.com.key", crypto.load_privatekey)
+            self.assertEqual(keys.key_type(key), "ed25519")
+            args = ["cert", "-n", "example.com", "-t", "ec-p256", "-s", "256"]
+            result = CliRunner().invoke(cli, args)
+            self.assertEqual(result.exit_code, 2, result.output)
+            result = CliRunner().invoke(cli, ["cert", "keypool", "-t", "ec-p384", "fill", "2"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(len(keypool.KeyPool(key_type="ec-p384")), 2)
+
+    def test_benchmark(self):
+        results = keytypes.run(repeat=1, rsa_sizes=(1024,))
+        self.assertEqual(set(results), {"rsa-1024", "ec-p256", "ec-p384", "ed25519"})
+
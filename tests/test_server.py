@@ -0,0 +1,30 @@
+from gstackutils import conf, client
+from benchmarks.server import start_server
+from . import CWDTestCase
+
+
+class TestServer(CWDTestCase):
+    cwd = "tests/temp"
+
+    def setUp(self):
+        super().setUp()
+        self.config = conf.Config("tests.fixtures.config_module")
+        self.stop_server = start_server(self.config, "conf.sock")
+
+    def tearDown(self):
+        self.stop_server()
+        super().tearDown()
+
+    def test_get(self):
+        self.config.set_many({"STRING": "hello", "file": b"\x00"})
+        with client.Client("conf.sock") as c:
+            self.assertEqual(c.get("STRING"), "hello")
+            self.assertEqual(c.get_many(["B", "file"]), {"B": "42", "file": b"\x00"})
+            with self.assertRaisesRegex(client.ServerError, "No such config"):
+                c.get("MISSING")
+            with self.assertRaisesRegex(client.ServerError, "not set"):
+                c.get("SECRET")
+            # a change by another process is picked up
+            conf.Config("tests.fixtures.config_module").set("STRING", "world")
+            self.assertEqual(c.get("STRING"), "world")
+            self.assertEqual(c.info(), self.config.info())
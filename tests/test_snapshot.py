@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+from gstackutils import conf, exceptions, snapshot
+from . import CWDTestCase
+
+
+class TestSnapshot(CWDTestCase):
+    cwd = "tests/temp"
+
+    def test_compile(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set_many({"STRING": "héllo", "SECRET": "psst", "file": b"\x00\x01"})
+        c.compile("snapshot")
+        self.assertEqual(os.stat("snapshot").st_mode & 0o777, 0o400)
+        with snapshot.load("snapshot") as snap:
+            self.assertEqual(snap["STRING"], "héllo")
+            self.assertEqual(snap["SECRET"], "psst")
+            self.assertEqual(snap.get("B"), "42")
+            self.assertEqual(snap.get_bytes("file").tobytes(), b"\x00\x01")
+            self.assertNotIn("email", snap)
+            self.assertIsNone(snap.get("email"))
+            self.assertEqual(len(snap), len(list(snap)))
+
+    def test_compile_invalid(self):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("B", 51, validate=False)
+        with self.assertRaises(exceptions.ValidationError):
+            c.compile("snapshot")
+        self.assertFalse(os.path.exists("snapshot"))
+        c.compile("snapshot", validate=False)
+
+    def test_lightweight(self):
+        code = (
+            "import sys; from gstackutils import snapshot; "
+            "print(sorted({'OpenSSL', 'click', 'rich', 'gstackutils.conf'} & set(sys.modules)))"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], env={**os.environ, "PYTHONPATH": self._orig_cwd},
+            stdout=subprocess.PIPE, check=True
+        ).stdout
+        self.assertEqual(out, b"[]\n")
@@ -0,0 +1,54 @@
+import io
+import sqlite3
+
+from gstackutils import conf, exceptions
+from . import CWDTestCase
+
+
+class TestSQLite(CWDTestCase):
+    cwd = "tests/temp"
+
+    def test_set_retrieve(self):
+        c = conf.Config("tests.fixtures.sqlite_module")
+        with self.assertRaises(exceptions.ConfigNotSetError):
+            c.retrieve("STRING")
+        c.set_many({"STRING": "hello", "SECRET": "psst", "NUMBERS": [1, 2]})
+        self.assertEqual(c.retrieve("STRING"), "hello")
+        self.assertEqual(c.retrieve("SECRET"), "psst")
+        self.assertEqual(c.retrieve("NUMBERS"), [1, 2])
+        c.set("NUMBERS", None)
+        with self.assertRaises(exceptions.DefaultException):
+            c.retrieve("NUMBERS")
+
+        db = sqlite3.connect("conf.sqlite")
+        self.assertEqual(db.execute("PRAGMA journal_mode").fetchone(), ("wal",))
+        self.assertEqual(
+            db.execute("SELECT value FROM config WHERE name = 'SECRET'").fetchone(),
+            ("cHNzdA==",)
+        )
+
+    def test_dotenv(self):
+        c = conf.Config("tests.fixtures.sqlite_module")
+        c.files[0].import_dotenv(io.StringIO("# comment\nSTRING=hello\nSECRET=cHNzdA==\n"))
+        self.assertEqual(c.retrieve("SECRET"), "psst")
+        out = io.StringIO()
+        c.files[0].export_dotenv(out)
+        self.assertEqual(sorted(out.getvalue().splitlines()), ["SECRET=cHNzdA==", "STRING=hello"])
+
+    def test_remove_stale(self):
+        c = conf.Config("tests.fixtures.sqlite_module")
+        c.files[0].import_dotenv(io.StringIO("STRING=hello\nOLD=1\n"))
+        self.assertEqual(c.remove_stale(), {c.files[0]: ["OLD"]})
+        self.assertEqual(c.remove_stale(), {})
+        self.assertEqual(c.retrieve("STRING"), "hello")
+
+    def test_read_file_sees_own_writes(self):
+        # every Config of the thread shares the connection of the storage
+        c1 = conf.Config("tests.fixtures.sqlite_module")
+        c2 = conf.Config("tests.fixtures.sqlite_module")
+        c1.set("STRING", "y")
+        self.assertEqual(c2.read_file(c2.files[0])["STRING"], "y")
+        c1.set("STRING", "z")
+        self.assertEqual(c2.read_file(c2.files[0])["STRING"], "z")
+        c1.files[0].prune(set())
+        self.assertEqual(c2.read_file(c2.files[0]), {})
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+# generous, to leave room for slow CI machines; it is around 0.1s normally
+STARTUP_BUDGET = 0.5
+HEAVY_MODULES = ["OpenSSL", "cryptography", "rich", "asyncio", "sqlite3", "gstackutils.cert"]
+
+
+class TestStartup(unittest.TestCase):
+    def run_python(self, code):
+        return subprocess.run(
+            [sys.executable, "-c", code],
+            env={**os.environ, "PYTHONPATH": os.getcwd()},
+            stdout=subprocess.PIPE, check=True,
+        ).stdout.decode()
+
+    def test_heavy_modules_not_imported(self):
+        out = self.run_python(
+            "import sys; import gstackutils.cli; "
+            f"print(sorted(set({HEAVY_MODULES!r}) & set(sys.modules)))"
+        )
+        self.assertEqual(out, "[]\n")
+
+    def test_import_time(self):
+        out = self.run_python(
+            "import time; start = time.perf_counter(); import gstackutils.cli; "
+            "print(time.perf_counter() - start)"
+        )
+        self.assertLess(float(out), STARTUP_BUDGET)
@@ -0,0 +1,123 @@
+import json
+import os
+import time
+from unittest import mock
+
+from gstackutils import conf, exceptions, fields, validation, validators
+from . import CWDTestCase
+
+
+def validated(c, name):
+    """Retrieve `name` and return the number of validate calls it took."""
+    validate = mock.patch.object(
+        fields.IntegerField, "validate", autospec=True, side_effect=fields.Field.validate
+    )
+    with validate as validate:
+        try:
+            c.retrieve(name)
+        except exceptions.ValidationError:
+            pass
+    return validate.call_count
+
+
+class TestValidationCache(CWDTestCase):
+    cwd = "tests/temp"
+
+    def config(self):
+        return conf.Config("tests.fixtures.config_module", validation_cache="validation.json")
+
+    def test_result_reused(self):
+        c = self.config()
+        c.set("B", 12)
+        self.assertEqual(validated(c, "B"), 1)
+        self.assertEqual(validated(c, "B"), 0)
+        c.validation_cache.save()
+        self.assertEqual(os.stat("validation.json").st_mode & 0o777, 0o600)
+        self.assertEqual(validated(self.config(), "B"), 0)
+
+    def test_keys_need_the_secret(self):
+        c = self.config()
+        c.set("SECRET", "psst")
+        c.retrieve("SECRET")
+        c.validation_cache.save()
+        self.assertEqual(os.stat("validation.json.key").st_mode & 0o777, 0o600)
+        with open("validation.json.key", "rb") as f:
+            self.assertEqual(len(f.read()), validation.SECRET_SIZE)
+        for secret_kept, counts in [(True, (1, 0)), (False, (0, 1))]:
+            if not secret_kept:
+                os.unlink("validation.json.key")
+            c = self.config()
+            c.retrieve("SECRET")
+            self.assertEqual((c.validation_cache.hits, c.validation_cache.misses), counts)
+
+    def test_errors_reused(self):
+        c = self.config()
+        with open(".conf", "w") as f:
+            f.write("B=51\n")
+        with self.assertRaises(exceptions.ValidationError) as cm:
+            c.retrieve("B")
+        c.validation_cache.save()
+        c = self.config()
+        with self.assertRaises(exceptions.ValidationError) as cached:
+            c.retrieve("B")
+        self.assertEqual(cached.exception.messages, cm.exception.messages)
+        self.assertEqual(c.validation_cache.hits, 1)
+
+    def test_changed_value_revalidated(self):
+        c = self.config()
+        c.set("B", 12)
+        self.assertEqual(validated(c, "B"), 1)
+        c.set("B", 13)
+        self.assertEqual(validated(c, "B"), 1)
+
+    def test_changed_validators_revalidated(self):
+        c = self.config()
+        c.set("B", 12)
+        validated(c, "B")
+        c.validation_cache.save()
+        c = self.config()
+        _, field = c.get_field("B")
+        stricter = [*field.validators, validators.MinValueValidator(13)]
+        with mock.patch.object(field, "validators", stricter):
+            with self.assertRaises(exceptions.ValidationError):
+                c.retrieve("B")
+
+    def test_expired_result_revalidated(self):
+        c = self.config()
+        c.set("B", 12)
+        with mock.patch.object(fields.Field, "validation_expiry", return_value=time.time() - 1):
+            self.assertEqual(validated(c, "B"), 1)
+            self.assertEqual(validated(c, "B"), 1)
+        with mock.patch.object(fields.Field, "validation_expiry", return_value=time.time() + 60):
+            self.assertEqual(validated(c, "B"), 1)
+            self.assertEqual(validated(c, "B"), 0)
+
+    def test_info_saves(self):
+        c = self.config()
+        c.set("B", 12)
+        c.info()
+        with open("validation.json") as f:
+            data = json.load(f)
+        self.assertEqual(data["version"], validation.CACHE_VERSION)
+        self.assertIn("B", data["entries"])
+        c = self.config()
+        self.assertEqual(c.info(), conf.Config("tests.fixtures.config_module").info())
+        self.assertGreater(c.validation_cache.hits, 0)
+        self.assertEqual(c.validation_cache.misses, 0)
+
+    def test_corrupt_file_ignored(self):
+        with open("validation.json", "w") as f:
+            f.write("{")
+        c = self.config()
+        c.set("B", 12)
+        self.assertEqual(c.retrieve("B"), 12)
+
+    def test_certificate_expiry(self):
+        from gstackutils import cert
+
+        validator = validators.CertificateExpiryValidator()
+        crt = cert.make_cert("example.com")
+        expiry = validator.cache_expiry(crt)
+        self.assertAlmostEqual(expiry, time.time() + cert.CERT_NOT_AFTER, delta=60)
+        crt.gmtime_adj_notAfter(-60)
+        self.assertIsNone(validator.cache_expiry(crt))
@@ -0,0 +1,94 @@
+import random
+import time
+import unittest
+
+from gstackutils import exceptions, validators
+from benchmarks import validators as bench
+
+
+HOSTS = [
+    "", "a", "A9", "example.com", "gstack.localhost", "a-b.c-d", "-a", "a-", "a..b", ".a", "a.",
+    "a_b", "xn--bcher-kva.example", "é.com", "1.2.3.4", "a\n", "a\n\n", "\na", "a.b\n", "a b",
+    "a." * 100 + "b", "a" * 300,
+]
+IPS = [
+    "", "0.0.0.0", "1.2.3.4", "255.255.255.255", "256.1.1.1", "01.2.3.4", "1.2.3", "1.2.3.4.5",
+    "1.2.3.4\n", "1.2.3.4\n\n", "1..2.3", "١.2.3.4", "1.2.3.4/0", "1.2.3.4/1", "1.2.3.4/32",
+    "1.2.3.4/33", "1.2.3.4/", "1.2.3.4/8\n", "1.2.3.4/8\n\n", "1.2.3.4/\n", "1.2.3.4/ 8",
+    "1.2.3.4/+8", "1.2.3.4/1_0", "1.2.3.4/٣", "1.2.3.4//8", "1.2.3.4/x", "a.b.c.d/8",
+    "199.249.250.251", "100.200.0.9", "300.0.0.1/8",
+]
+EMAILS = [
+    "", "a@b", "john.doe@example.com", "a.@b", ".a@b", "a..b@c", "a@b.", "a@.b", "@b", "a@",
+    "a@@b", '"john doe"@example.com', '"a\\"b"@c', '"a\\\nb"@c', '"unterminated@c',
+    "a@[1.2.3.4]", "a@[1.2[3]", "a@[\\]]", "(comment)a@b", "a(comment)@b(x)", "a@b (x y) ",
+    "(a(b)c)d@e", "(a\\)b)c@d", "(\\\n)a@b", " a @ b ", "a\r\n @b", "a@b\n", "\x0ba@b\x0c",
+    "jöhn@exämple.com", "a b@c", "a@b c", "a!#$%&'*+-/=?^_`{|}~@b", "a,b@c", "a@b@c",
+    "\x00@b", '"\x0e"@b', "(\x7f)a@b", "a@[\x01]", " a@b ", "a@b. ",
+]
+ALPHABETS = {
+    "host": "aZ9-.\n_ é",
+    "ip": "0125.9/\n x",
+    "email": 'a.@"\\()[] \n\r\x0b\x00\x0eé,',
+}
+
+
+def corpus(kind, seed=0, count=3000, max_length=12):
+    rnd = random.Random(seed)
+    alphabet = ALPHABETS[kind]
+    for _ in range(count):
+        yield "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, max_length)))
+
+
+def accepts(validator):
+    def accept(value):
+        try:
+            validator(value)
+        except exceptions.ValidationError:
+            return False
+        return True
+    return accept
+
+
+class TestValidators(unittest.TestCase):
+    def assertSameAsReference(self, accept, reference, values):
+        for value in values:
+            with self.subTest(value=value):
+                self.assertEqual(accept(value), reference(value))
+
+    def test_host_name(self):
+        values = HOSTS + list(corpus("host"))
+        self.assertSameAsReference(
+            accepts(validators.HostNameValidator()), bench.reference_host_name, values
+        )
+        self.assertSameAsReference(
+            accepts(validators.HostNameValidator(ip_ok=True)),
+            lambda v: bench.reference_host_name(v) or bench.reference_ip(v),
+            values + IPS,
+        )
+
+    def test_ip(self):
+        values = IPS + list(corpus("ip"))
+        self.assertSameAsReference(accepts(validators.IPValidator()), bench.reference_ip, values)
+        self.assertSameAsReference(
+            accepts(validators.IPValidator(range=True)),
+            lambda v: bench.reference_ip(v, range=True),
+            values,
+        )
+
+    def test_email(self):
+        values = EMAILS + list(corpus("email"))
+        self.assertSameAsReference(
+            accepts(validators.EmailValidator()),
+            lambda v: bench.reference_email(v[1]),
+            [("", v) for v in values],
+        )
+        self.assertSameAsReference(
+            validators.EmailValidator().is_valid, bench.reference_email, values
+        )
+
+    def test_linear_time(self):
+        start = time.perf_counter()
+        results = bench.run(size=1000, repeat=1)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(set(results), set(bench.pathological(1)))
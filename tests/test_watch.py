@@ -0,0 +1,42 @@
+import threading
+import time
+
+from gstackutils import conf
+from . import CWDTestCase
+
+
+class TestWatch(CWDTestCase):
+    cwd = "tests/temp"
+
+    def watch(self, poll):
+        c = conf.Config("tests.fixtures.config_module")
+        c.set("STRING", "hello")
+        changes = []
+        stop = threading.Event()
+        t = threading.Thread(target=c.watch, args=(lambda *a: changes.append(a),), kwargs={
+            "names": ["STRING", "B"], "interval": 0.05, "debounce": 0.2,
+            "poll": poll, "stop": stop,
+        })
+        t.start()
+        try:
+            time.sleep(0.2)
+            writer = conf.Config("tests.fixtures.config_module")
+            writer.set("SECRET", "unwatched")
+            writer.set("STRING", "world")
+            writer.set("B", 12)
+            writer.set("B", 13)
+            deadline = time.monotonic() + 5
+            while len(changes) < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            writer.set("SECRET", "still unwatched")
+            time.sleep(0.5)
+        finally:
+            stop.set()
+            t.join()
+        self.assertEqual(changes, [("STRING", "hello", "world"), ("B", 42, 13)])
+
+    def test_inotify(self):
+        self.watch(poll=False)
+
+    def test_polling(self):
+        self.watch(poll=True)